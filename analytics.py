@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+from tags import TAG_FIELDS
+
+# (row field, column field) pairs whose tag co-occurrence is counted
+CO_OCCURRENCE_PAIRS = [
+    ("Category", "Subcategory"),
+    ("Focus_Category", "Focus_Subcategory"),
+]
+# Rows unpacked to per-tag bits at a time when counting many rows (bounds memory)
+CHUNK_ROWS = 1 << 16
+
+
+def _pair_codes(rows_a, codes_a, rows_b, codes_b, n_rows):
+    # Every (a, b) code pair that shares a row; both inputs are sorted by row
+    count_b = np.bincount(rows_b, minlength=n_rows)
+    start_b = np.cumsum(count_b) - count_b
+    repeats = count_b[rows_a]
+    # Position of each pair within its row's run of b codes
+    offsets = np.arange(repeats.sum()) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    b_index = np.repeat(start_b[rows_a], repeats) + offsets
+    return np.repeat(codes_a, repeats), codes_b[b_index]
+
+
+class ProblemStats:
+    """
+    Aggregates over the problem table, kept up to date row by row.
+
+    Problems per year, problems per tag in each field and a tag x tag co-occurrence
+    count for each pair in CO_OCCURRENCE_PAIRS. Tags are indexed by their TagMatrix
+    code, so the counts are plain NumPy arrays. Changing a row subtracts its old
+    contribution and adds the new one, so nothing is recomputed per rerun or per edit.
+    """
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+        self.years = {}
+        self.tag_counts = {field: np.zeros(0, dtype=np.int64) for field in TAG_FIELDS}
+        self.pairs = {
+            pair: np.zeros((0, 0), dtype=np.int64) for pair in CO_OCCURRENCE_PAIRS
+        }
+
+    def _ensure_size(self):
+        # New tags get new codes; grow the arrays to match
+        n_tags = len(self.matrix.tags)
+        for field, counts in self.tag_counts.items():
+            if len(counts) < n_tags:
+                self.tag_counts[field] = np.pad(counts, (0, n_tags - len(counts)))
+        for pair, counts in self.pairs.items():
+            if len(counts) < n_tags:
+                grow = n_tags - len(counts)
+                self.pairs[pair] = np.pad(counts, ((0, grow), (0, grow)))
+
+    def _row_codes(self, field, positions):
+        # (index into positions, tag code) for every tag set on those rows
+        words = self.matrix.words[field][positions].astype("<u8")
+        bits = np.unpackbits(words.view(np.uint8), axis=1, bitorder="little")
+        return np.nonzero(bits)
+
+    def add(self, positions, years):
+        """
+        Count the rows at positions (with their Year values).
+        """
+        self._accumulate(positions, years, 1)
+
+    def remove(self, positions, years):
+        """
+        Stop counting the rows at positions, as they are before a change or delete.
+        """
+        self._accumulate(positions, years, -1)
+
+    def _accumulate(self, positions, years, sign):
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(positions) == 0:
+            return
+        self._ensure_size()
+
+        values, counts = np.unique(
+            pd.Series(years).dropna().astype(np.int64), return_counts=True
+        )
+        for year, count in zip(values.tolist(), counts.tolist()):
+            total = self.years.get(year, 0) + sign * count
+            if total:
+                self.years[year] = total
+            else:
+                self.years.pop(year, None)
+
+        for start in range(0, len(positions), CHUNK_ROWS):
+            self._accumulate_tags(positions[start : start + CHUNK_ROWS], sign)
+
+    def _accumulate_tags(self, positions, sign):
+        # Scatter-add, so the cost follows the number of tags on the rows rather than
+        # the size of the arrays (a single-row edit touches a handful of cells)
+        codes = {field: self._row_codes(field, positions) for field in TAG_FIELDS}
+        for field, (_, field_codes) in codes.items():
+            np.add.at(self.tag_counts[field], field_codes, sign)
+        for field_a, field_b in CO_OCCURRENCE_PAIRS:
+            a, b = _pair_codes(*codes[field_a], *codes[field_b], len(positions))
+            np.add.at(self.pairs[(field_a, field_b)], (a, b), sign)
+
+    def _used_tags(self, field):
+        counts = self.tag_counts[field]
+        return [self.matrix.tags[code] for code in np.flatnonzero(counts)]
+
+    def year_counts(self):
+        """
+        Problems per year, as a Series sorted by year.
+        """
+        return pd.Series(self.years, dtype=np.int64).sort_index()
+
+    def tag_frequencies(self):
+        """
+        Problems per tag in each field, plus the share of a tag's uses that are as a focus.
+        """
+        self._ensure_size()
+        df = pd.DataFrame(self.tag_counts, index=pd.Index(self.matrix.tags, name="Tag"))
+        df = df[df.sum(axis=1) > 0]
+        focus = df["Focus_Category"] + df["Focus_Subcategory"]
+        total = focus + df["Category"] + df["Subcategory"]
+        df["Focus_Ratio"] = (focus / total).round(3)
+        return df
+
+    def co_occurrence(self, pair=CO_OCCURRENCE_PAIRS[0], rows=None, columns=None):
+        """
+        Co-occurrence counts for a field pair as a labelled DataFrame: how many problems
+        carry each row tag in pair[0] together with each column tag in pair[1].
+        Defaults to the tags that occur in each field; pass rows/columns (e.g. the
+        taxonomy) to include tags with no problems.
+        """
+        self._ensure_size()
+        codes = self.matrix.codes
+        if rows is None:
+            rows = self._used_tags(pair[0])
+        if columns is None:
+            columns = self._used_tags(pair[1])
+        # Tags nobody has used yet have no code and count zero
+        row_codes = [codes.get(tag, -1) for tag in rows]
+        column_codes = [codes.get(tag, -1) for tag in columns]
+        padded = np.pad(self.pairs[pair], ((0, 1), (0, 1)))
+        return pd.DataFrame(
+            padded[np.ix_(row_codes, column_codes)], index=rows, columns=columns
+        )
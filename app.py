@@ -1,64 +1,51 @@
 import streamlit as st
-import pandas as pd
 import os
 
-
-class ProblemDatabaseApp:
-    def __init__(
-        self, db_file="sample_db.csv", categories_file="sample_categories.csv"
-    ):
-        self.db_file = db_file
-        self.categories_file = categories_file
-        self.df = self.load_database()
-        self.categories, self.subcategories = self.load_categories_and_subcategories()
-
-    def load_database(self):
-        """
-        Load the problem database from the CSV file or initialize a new DataFrame if it doesn't exist.
-        """
-        if os.path.exists(self.db_file):
-            return pd.read_csv(self.db_file)
-        else:
-            return pd.DataFrame(
-                columns=[
-                    "Custom_Problem_ID",
-                    "Category",
-                    "Subcategory",
-                    "Year",
-                    "Focus_Category",
-                    "Focus_Subcategory",
-                ]
-            )
-
-    def load_categories_and_subcategories(self):
-        """
-        Load categories and subcategories from the categories.csv file.
-        """
-        if os.path.exists(self.categories_file):
-            df_categories = pd.read_csv(self.categories_file)
-            categories = df_categories["Category"].unique().tolist()
-            subcategories = {}
-
-            # Populate the subcategories dictionary
-            for category in categories:
-                subcategories[category] = df_categories[
-                    df_categories["Category"] == category
-                ]["Subcategory"].tolist()
-
-            return categories, subcategories
-        else:
-            return [], {}
-
-    def save_database(self):
-        """
-        Save the current DataFrame to the CSV file.
-        """
-        self.df.to_csv(self.db_file, index=False)
+from analytics import CO_OCCURRENCE_PAIRS
+from backup import BackupStore, default_backup_dir
+from bulk import FOCUS_FIELDS, select_rows
+from engine import ConflictError, ProblemDatabase
+from export import EXPORT_FORMATS, export_chunks
+from history import UndoHistory
+from profiling import Profiler, traced
+from registry import load_registry
+from state_cache import STATE_CACHE
+from storage import CsvStorage, SqliteStorage
+from tags import TAG_FIELDS
+
+PAGE_SIZES = [25, 50, 100, 250]
+# Number of IDs offered at a time by the edit picker
+PICKER_PAGE_SIZE = 50
+SORT_COLUMNS = {"Table order": None, "Year": "Year", "Problem ID": "Custom_Problem_ID"}
+# Sidebar label -> ProblemDatabase method
+TAXONOMY_OPERATIONS = {
+    "Rename category": "rename_category",
+    "Merge categories": "merge_categories",
+    "Delete category": "delete_category",
+    "Rename subcategory": "rename_subcategory",
+    "Merge subcategories": "merge_subcategories",
+    "Delete subcategory": "delete_subcategory",
+}
+
+
+def _shown_rows(app, result):
+    # Span counters for the page sections
+    return {"rows": len(app.df)}
+
+
+class ProblemDatabaseApp(ProblemDatabase):
+    """
+    Streamlit front end for a ProblemDatabase.
+    The mutation methods wrap the engine's and report the outcome in the page.
+    """
 
     def display_sidebar(self):
         """
         Display the sidebar for adding new problems and custom categories/subcategories.
         """
+        # Undo and redo sit at the top but are drawn last (see display_history)
+        self.history_slot = st.sidebar.container()
+
         st.sidebar.header("Add/Edit Problem")
 
         # Add new problem (this comes first)
@@ -68,29 +55,20 @@ class ProblemDatabaseApp:
             "Year", min_value=1900, max_value=2100, value=2025
         )
 
-        # Ensure a blank option is available for categories and subcategories
-        category = st.sidebar.multiselect("Select Category(s)", [""] + self.categories)
-        subcategory_options = [
-            sub
-            for t in category
-            if t in self.subcategories
-            for sub in self.subcategories[t]
-        ]
+        # Options come from the taxonomy index: dictionary lookups, memoized per selection
+        taxonomy = self.taxonomy
+        category = st.sidebar.multiselect(
+            "Select Category(s)", taxonomy.category_options
+        )
         subcategory = st.sidebar.multiselect(
-            "Select Subcategory(s)", [""] + list(set(subcategory_options))
+            "Select Subcategory(s)", taxonomy.options(category)
         )
 
         focus_category = st.sidebar.multiselect(
-            "Focus Category(s)", [""] + self.categories
+            "Focus Category(s)", taxonomy.category_options
         )
-        focus_subcategory_options = [
-            sub
-            for t in focus_category
-            if t in self.subcategories
-            for sub in self.subcategories[t]
-        ]
         focus_subcategory = st.sidebar.multiselect(
-            "Focus Subcategory(s)", [""] + list(set(focus_subcategory_options))
+            "Focus Subcategory(s)", taxonomy.options(focus_category)
         )
 
         if st.sidebar.button("Add Problem"):
@@ -103,6 +81,14 @@ class ProblemDatabaseApp:
                 focus_subcategory,
             )
 
+        # Bulk import from a file
+        st.sidebar.subheader("Bulk Import")
+        uploaded_file = st.sidebar.file_uploader(
+            "Problems file (CSV or JSONL)", type=["csv", "jsonl"]
+        )
+        if uploaded_file is not None and st.sidebar.button("Import Problems"):
+            self.import_problems(uploaded_file)
+
         # Manage Custom Category and Subcategory (this comes last)
         st.sidebar.subheader("Manage Custom Categories and Subcategories")
 
@@ -116,7 +102,7 @@ class ProblemDatabaseApp:
         custom_category_to_edit = st.sidebar.selectbox(
             # Shows all categories including custom
             "Edit Custom Category",
-            [""] + self.categories,
+            taxonomy.category_options,
         )
         if custom_category_to_edit:
             edited_category_name = st.sidebar.text_input(
@@ -124,7 +110,7 @@ class ProblemDatabaseApp:
             )
             edited_subcategories = st.sidebar.text_area(
                 "Edit Subcategories (comma-separated)",
-                value=", ".join(self.subcategories.get(custom_category_to_edit, [])),
+                value=", ".join(taxonomy.subcategories.get(custom_category_to_edit, ())),
             )
 
             if st.sidebar.button("Save Category Changes"):
@@ -137,54 +123,165 @@ class ProblemDatabaseApp:
         if add_custom_category:
             self.add_custom_category(add_custom_category, add_custom_subcategory)
 
-    def add_custom_category(self, custom_category, custom_subcategory):
+        self.display_taxonomy_tools()
+        if self.backups is not None:
+            self.display_backups()
+
+        cache_stats = STATE_CACHE.stats()
+        st.sidebar.caption(
+            f"State cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+            f"{cache_stats['evictions']} evictions, {cache_stats['bytes'] / 2**20:.0f} "
+            f"of {cache_stats['max_bytes'] / 2**20:.0f} MiB"
+        )
+        st.sidebar.caption(f"Database version: {self.version}")
+        if self.writer is not None:
+            writer_stats = self.writer.stats()
+            st.sidebar.caption(
+                f"Background writer: {writer_stats['submitted']} saves requested, "
+                f"{writer_stats['writes']} written"
+            )
+
+    def display_history(self):
         """
-        Add a new custom category and its subcategory if provided.
+        Undo and redo buttons for this session's changes, named after the step they act on.
+        They are drawn into the slot at the top of the sidebar after the page, so they
+        reflect a change saved in this same rerun. Clicks run as callbacks, before the
+        next rerun draws the page.
         """
-        if custom_category not in self.categories:
-            self.categories.append(custom_category)
-            self.subcategories[custom_category] = (
-                [custom_subcategory] if custom_subcategory else []
-            )
-            st.sidebar.success("Custom category added successfully!")
-            self.save_categories()  # Save categories to CSV after modification
-        else:
-            st.sidebar.warning("Category already exists!")
+        undo_column, redo_column = self.history_slot.columns(2)
+        undo_label, redo_label = self.history.next_undo(), self.history.next_redo()
+        undo_column.button(
+            "Undo", disabled=undo_label is None, help=undo_label, on_click=self.undo
+        )
+        redo_column.button(
+            "Redo", disabled=redo_label is None, help=redo_label, on_click=self.redo
+        )
 
-    def update_custom_category(self, old_category, new_category, new_subcategories):
+    def undo(self):
         """
-        Update an existing custom category and its subcategories.
+        Revert this session's latest change.
         """
-        new_subcategories_list = [
-            sub.strip() for sub in new_subcategories.split(",") if sub.strip()
-        ]
+        label = self.history.next_undo()
+        try:
+            super().undo()
+        except ValueError as error:
+            st.sidebar.warning(str(error))
+        else:
+            st.sidebar.success(f"Undone: {label}")
 
-        # Update the category name
-        if old_category in self.categories:
-            self.categories = [
-                new_category if t == old_category else t for t in self.categories
-            ]
-            self.subcategories[new_category] = new_subcategories_list
+    def redo(self):
+        """
+        Reapply the change last undone.
+        """
+        label = self.history.next_redo()
+        try:
+            super().redo()
+        except ValueError as error:
+            st.sidebar.warning(str(error))
+        else:
+            st.sidebar.success(f"Redone: {label}")
 
-            # Remove old category
-            if old_category != new_category:
-                del self.subcategories[old_category]
+    def display_taxonomy_tools(self):
+        """
+        Rename, merge or delete categories and subcategories; problems are retagged to match.
+        """
+        st.sidebar.subheader("Reorganize Categories")
+        operation = st.sidebar.selectbox("Operation", TAXONOMY_OPERATIONS)
+        taxonomy = self.taxonomy
+        category = st.sidebar.selectbox(
+            "Category", taxonomy.categories, key="taxonomy_category"
+        )
+        if category is None:
+            return
+        subs = taxonomy.subcategories.get(category, ())
+
+        if operation == "Rename category":
+            new_name = st.sidebar.text_input("New category name", value=category)
+            args = (category, new_name.strip())
+        elif operation == "Merge categories":
+            sources = st.sidebar.multiselect(
+                "Merge these categories into it",
+                [c for c in taxonomy.categories if c != category],
+            )
+            args = (sources, category)
+        elif operation == "Delete category":
+            args = (category,)
+        elif operation == "Rename subcategory":
+            old_name = st.sidebar.selectbox("Subcategory", subs)
+            new_name = st.sidebar.text_input("New subcategory name", value=old_name or "")
+            args = (category, old_name, new_name.strip())
+        elif operation == "Merge subcategories":
+            target = st.sidebar.selectbox("Merge into", subs)
+            sources = st.sidebar.multiselect(
+                "Subcategories to merge", [sub for sub in subs if sub != target]
+            )
+            args = (category, sources, target)
+        else:
+            args = (category, st.sidebar.selectbox("Subcategory", subs))
+
+        if st.sidebar.button(operation):
+            method = getattr(self, TAXONOMY_OPERATIONS[operation])
+            try:
+                method(*args)
+            except ValueError as error:
+                st.sidebar.error(str(error))
+            else:
+                st.sidebar.success(f"{operation}: done, problems retagged.")
+
+    def display_backups(self):
+        """
+        List the bank's snapshots, compare two of them, take one now or restore one.
+        """
+        with st.sidebar.expander("Backups"):
+            if st.button("Back up now"):
+                try:
+                    manifest = self.backup(reason="manual")
+                except ValueError as error:
+                    st.error(str(error))
+                else:
+                    st.success(f"Backed up as {manifest['id']}.")
+            history = self.backups.history()
+            if len(history) == 0:
+                st.caption("No backups yet.")
+                return
+            st.dataframe(history.iloc[::-1], hide_index=True)
+
+            ids = history["ID"].tolist()[::-1]
+            snapshot_id = st.selectbox("Backup", ids)
+            older = ids[ids.index(snapshot_id) + 1 :]
+            if older:
+                base_id = st.selectbox("Compare with", older)
+                if st.button("Show changes"):
+                    st.dataframe(self.diff_backups(base_id, snapshot_id), hide_index=True)
+            if st.button("Restore this backup"):
+                try:
+                    self.restore_backup(snapshot_id)
+                except ValueError as error:
+                    st.error(str(error))
+                else:
+                    st.success(f"Restored {snapshot_id}; the previous state was backed up.")
 
-            st.sidebar.success("Custom category updated successfully!")
-            self.save_categories()  # Save categories to CSV after modification
+    def add_custom_category(self, custom_category, custom_subcategory):
+        """
+        Add a new custom category and its subcategory if provided.
+        """
+        try:
+            super().add_custom_category(custom_category, custom_subcategory)
+        except ValueError as error:
+            st.sidebar.warning(str(error))
         else:
-            st.sidebar.error("Category does not exist!")
+            st.sidebar.success("Custom category added successfully!")
 
-    def save_categories(self):
+    def update_custom_category(self, old_category, new_category, new_subcategories):
         """
-        Save the current categories and subcategories to the categories.csv file.
+        Update an existing custom category and its subcategories.
         """
-        rows = []
-        for category, subs in self.subcategories.items():
-            for sub in subs:
-                rows.append([category, sub])
-        df_categories = pd.DataFrame(rows, columns=["Category", "Subcategory"])
-        df_categories.to_csv(self.categories_file, index=False)
+        try:
+            super().update_custom_category(old_category, new_category, new_subcategories)
+        except ValueError as error:
+            st.sidebar.error(str(error))
+        else:
+            st.sidebar.success("Custom category updated successfully!")
 
     def add_problem(
         self, problem_id, category, subcategory, year, focus_category, focus_subcategory
@@ -192,88 +289,146 @@ class ProblemDatabaseApp:
         """
         Add a new problem to the database.
         """
-        if problem_id:
-            new_data = {
-                "Custom_Problem_ID": problem_id,
-                "Category": ", ".join(category),
-                "Subcategory": ", ".join(subcategory) if subcategory else "",
-                "Year": year,
-                "Focus_Category": ", ".join(focus_category),
-                "Focus_Subcategory": ", ".join(focus_subcategory),
-            }
-            new_df = pd.DataFrame([new_data])
-            self.df = pd.concat([self.df, new_df], ignore_index=True)
-            self.save_database()
-            st.sidebar.success("Problem added successfully!")
+        try:
+            super().add_problem(
+                problem_id, category, subcategory, year, focus_category, focus_subcategory
+            )
+        except ValueError as error:
+            st.sidebar.error(str(error))
         else:
-            st.sidebar.error("Problem ID cannot be empty!")
+            st.sidebar.success("Problem added successfully!")
+
+    def import_problems(self, source, name=None):
+        """
+        Import a CSV or JSONL file of problems, listing the rows that were skipped.
+        """
+        try:
+            imported, errors = super().import_problems(source, name)
+        except ValueError as error:
+            st.sidebar.error(f"Could not import the file: {error}")
+            return
+        st.sidebar.success(f"Imported {imported} problem(s).")
+        if len(errors) > 0:
+            st.sidebar.error(f"{len(errors)} problem(s) in the file were skipped:")
+            st.sidebar.dataframe(errors, hide_index=True)
 
+    @traced(measure=_shown_rows)
     def display_problems(self):
         """
         Display the database and allow editing or deleting problems.
         """
         st.header("Problem Database")
         if len(self.df) > 0:
-            st.write(self.df)
+            matches = self.filter_problems()
+            self.display_page(matches)
             self.edit_or_delete_problem()
+            self.display_bulk_edit(matches)
+            self.display_export(matches)
         else:
             st.write("No problems available.")
 
+    def filter_problems(self):
+        """
+        Show the tag filter panel and return the matching problems.
+        Each selected tag must be present; matches come from the tag -> problem ID index.
+        """
+        with st.expander("Filter by tags"):
+            selected = {
+                field: st.multiselect(
+                    field.replace("_", " "), sorted(self.table.postings.tags(field))
+                )
+                for field in TAG_FIELDS
+            }
+
+        matches = self.find_problems(selected)
+        if any(selected.values()):
+            st.caption(f"{len(matches)} matching problem(s)")
+        return matches
+
+    def display_page(self, df):
+        """
+        Show one page of the (already filtered) problems.
+        Sorting and slicing happen here, so only the visible rows are sent to the browser.
+        """
+        sort_col, order_col, size_col, page_col = st.columns(4)
+        sort_by = sort_col.selectbox("Sort by", list(SORT_COLUMNS))
+        descending = order_col.selectbox("Order", ["Ascending", "Descending"]) == "Descending"
+        page_size = size_col.selectbox("Rows per page", PAGE_SIZES)
+        n_pages = max(1, -(-len(df) // page_size))
+        page = page_col.selectbox("Page", range(1, n_pages + 1))
+
+        st.dataframe(
+            self.sort_and_page(df, SORT_COLUMNS[sort_by], descending, page, page_size),
+            hide_index=True,
+        )
+        st.caption(f"Page {page} of {n_pages} ({len(df)} problem(s))")
+
+    @traced(measure=_shown_rows)
     def edit_or_delete_problem(self):
         """
         Allow editing or deleting a selected problem.
+        The picker lists one page of IDs, or the best matches for the search text.
         """
-        selected_problem_id = st.selectbox(
-            "Select a problem to edit or delete", self.df["Custom_Problem_ID"].tolist()
+        search_col, page_col = st.columns([3, 1])
+        query = search_col.text_input(
+            "Search problems", placeholder="Problem ID or tag, e.g. 2010_P05 or rate law"
         )
-        selected_problem = self.df[self.df["Custom_Problem_ID"] == selected_problem_id]
+        if query:
+            # Ranked typeahead matches; tags expand to the problems carrying them
+            matched_tags = [text for kind, text in self.search(query) if kind == "tag"]
+            if matched_tags:
+                search_col.caption("Matching tags: " + ", ".join(matched_tags))
+            options = self.search_problem_ids(query, PICKER_PAGE_SIZE)
+        else:
+            ids = self.df["Custom_Problem_ID"]
+            n_pages = max(1, -(-len(ids) // PICKER_PAGE_SIZE))
+            picker_page = page_col.selectbox("Results page", range(1, n_pages + 1))
+            start = (picker_page - 1) * PICKER_PAGE_SIZE
+            options = ids.iloc[start : start + PICKER_PAGE_SIZE].tolist()
+
+        selected_problem_id = st.selectbox("Select a problem to edit or delete", options)
+        position = self.table.position(selected_problem_id)
 
-        if selected_problem.empty:
+        if position is None:
             st.warning("No problem selected.")
             return
 
+        # The version this session's edits are based on, kept across reruns until it saves
+        versions = self.session_row_versions()
+        expected_version = versions.setdefault(
+            selected_problem_id, self.row_version(selected_problem_id)
+        )
+
         st.subheader("Edit Problem Details")
         (
             current_category,
             current_subcategories,
             current_focus_category,
             current_focus_subcategory,
-        ) = self.get_current_values(selected_problem)
+        ) = self.get_current_values(position)
 
+        taxonomy = self.taxonomy
         edit_categories = st.multiselect(
-            "Edit Category(s)", [""] + self.categories, default=current_category
+            "Edit Category(s)", taxonomy.category_options, default=current_category
         )
-        edit_subcategories_options = [
-            sub
-            for category in edit_categories
-            if category in self.subcategories
-            for sub in self.subcategories.get(category, [])
-        ]
         edit_subcategories = st.multiselect(
             "Edit Subcategory(s)",
-            [""] + list(set(edit_subcategories_options + current_subcategories)),
+            taxonomy.options(edit_categories, include=current_subcategories),
             default=current_subcategories,
         )
 
         edit_year = st.number_input(
-            "Edit Year", value=int(selected_problem["Year"].values[0])
+            "Edit Year", value=int(self.table.row(position)["Year"])
         )
 
         edit_focus_categories = st.multiselect(
             "Edit Focus Category(s)",
-            [""] + self.categories,
+            taxonomy.category_options,
             default=current_focus_category,
         )
-        edit_focus_subcategories_options = [
-            sub
-            for category in edit_focus_categories
-            if category in self.subcategories
-            for sub in self.subcategories.get(category, [])
-        ]
         edit_focus_subcategories = st.multiselect(
             "Edit Focus Subcategory(s)",
-            [""]
-            + list(set(edit_focus_subcategories_options + current_focus_subcategory)),
+            taxonomy.options(edit_focus_categories, include=current_focus_subcategory),
             default=current_focus_subcategory,
         )
 
@@ -285,74 +440,357 @@ class ProblemDatabaseApp:
                 edit_year,
                 edit_focus_categories,
                 edit_focus_subcategories,
+                expected_version,
             )
 
         if st.button("Delete Problem"):
-            self.delete_problem(selected_problem_id)
+            self.delete_problem(selected_problem_id, expected_version)
 
-    def get_current_values(self, problem_row):
+    def display_export(self, matches):
         """
-        Helper function to extract current values from the DataFrame row.
-        This ensures that missing values are handled properly by converting them to empty strings.
+        Download the problems matching the tag filter as JSONL, Excel or a practice
+        sheet. Nothing is rendered until the button is clicked; the export is then
+        built chunk by chunk off the page's thread.
         """
-        category = (
-            str(problem_row["Category"].values[0])
-            if pd.notna(problem_row["Category"].values[0])
-            else ""
-        )
-        subcategory = (
-            str(problem_row["Subcategory"].values[0])
-            if pd.notna(problem_row["Subcategory"].values[0])
-            else ""
-        )
-        focus_category = (
-            str(problem_row["Focus_Category"].values[0])
-            if pd.notna(problem_row["Focus_Category"].values[0])
-            else ""
-        )
-        focus_subcategory = (
-            str(problem_row["Focus_Subcategory"].values[0])
-            if pd.notna(problem_row["Focus_Subcategory"].values[0])
-            else ""
-        )
+        with st.expander("Export"):
+            format_col, title_col = st.columns(2)
+            fmt = format_col.selectbox(
+                "Format",
+                list(EXPORT_FORMATS),
+                format_func=lambda fmt: EXPORT_FORMATS[fmt][0],
+            )
+            title = title_col.text_input("Sheet title", "Practice problems")
+            _, extension, mime = EXPORT_FORMATS[fmt]
+            name = os.path.splitext(os.path.basename(self.storage.key))[0]
+            st.download_button(
+                f"Download {len(matches)} problem(s)",
+                lambda: b"".join(export_chunks(matches, fmt, title)),
+                file_name=f"{name}.{extension}",
+                mime=mime,
+                on_click="ignore",
+            )
+
+    def display_bulk_edit(self, matches):
+        """
+        Change many problems at once: those matching the tag filter, narrowed by year
+        and ID pattern. The changed cells are previewed, and applying them is one write.
+        """
+        with st.expander("Bulk edit"):
+            years = self.df["Year"]
+            first_col, last_col, pattern_col = st.columns(3)
+            first = first_col.number_input("From year", value=int(years.min()))
+            last = last_col.number_input("To year", value=int(years.max()))
+            id_pattern = pattern_col.text_input(
+                "Problem IDs", placeholder="e.g. 2015_* or 20?0_P0*"
+            )
+            selected = select_rows(matches, (first, last), id_pattern)
+            ids = selected["Custom_Problem_ID"].tolist()
+            st.caption(
+                f"{len(ids)} problem(s) selected (use *Filter by tags* to pick by tag)"
+            )
+
+            taxonomy = self.taxonomy
+            names = {
+                "Category": list(taxonomy.categories),
+                "Subcategory": list(taxonomy.categories_of),
+            }
+            operations = []
+            for field in TAG_FIELDS:
+                label = field.replace("_", " ").lower()
+                options = names[field.replace("Focus_", "")]
+                add_col, remove_col = st.columns(2)
+                add = add_col.multiselect(f"Add {label}", options, key=f"bulk_add_{field}")
+                remove = remove_col.multiselect(
+                    f"Remove {label}", options, key=f"bulk_remove_{field}"
+                )
+                if add:
+                    operations.append(("add_tags", field, add))
+                if remove:
+                    operations.append(("remove_tags", field, remove))
+            if st.checkbox("Replace the focus tags"):
+                for field in FOCUS_FIELDS:
+                    label = field.replace("_", " ").lower()
+                    focus = st.multiselect(
+                        f"New {label}",
+                        names[field.replace("Focus_", "")],
+                        key=f"bulk_set_{field}",
+                    )
+                    operations.append(("set_focus", field, focus))
+            if st.checkbox("Set the year"):
+                year = st.number_input("New year", min_value=1900, max_value=2100)
+                operations.append(("set_year", "Year", year))
+            if not operations or not ids:
+                return
+
+            try:
+                changed, diff = self.plan_bulk_edit(ids, operations)
+            except ValueError as error:
+                st.error(str(error))
+                return
+            st.caption(f"{len(changed)} problem(s) would change:")
+            st.dataframe(diff, hide_index=True)
+            versions = {
+                problem_id: self.row_version(problem_id)
+                for problem_id in changed["Custom_Problem_ID"]
+            }
+            # Apply what the preview showed: the versions come from the previous rerun
+            plan = (self.storage.key, tuple(ids), repr(operations))
+            previous = st.session_state.get("bulk_edit_preview")
+            if len(changed) > 0 and st.button("Apply changes"):
+                if previous is not None and previous["plan"] == plan:
+                    versions = previous["versions"]
+                self.bulk_edit(ids, operations, versions)
+                # The preview above is out of date now; the next rerun shows a fresh one
+                st.session_state.pop("bulk_edit_preview", None)
+                return
+            st.session_state["bulk_edit_preview"] = {"plan": plan, "versions": versions}
+
+    def display_statistics(self):
+        """
+        Coverage statistics: problems per year, per tag and per (category, subcategory).
+        Everything shown is read from aggregates the table keeps up to date on each edit.
+        """
+        st.header("Statistics")
+        stats = self.table.stats
+
+        st.subheader("Problems per year")
+        st.bar_chart(stats.year_counts())
+
+        st.subheader("Tag frequencies")
+        st.caption("Problems per tag in each field; Focus Ratio is the share of uses as a focus.")
+        st.dataframe(stats.tag_frequencies().sort_values("Category", ascending=False))
+
+        focus = st.toggle("Use focus categories and subcategories")
+        st.subheader("Least covered topics")
+        coverage = self.coverage(focus)
+        st.dataframe(coverage.head(25), hide_index=True)
+
+        st.subheader("Category / subcategory co-occurrence")
+        pair = CO_OCCURRENCE_PAIRS[1] if focus else CO_OCCURRENCE_PAIRS[0]
+        st.dataframe(stats.co_occurrence(pair))
+
+        st.subheader("Integrity check")
+        issues = self.check_integrity()
+        if len(issues) == 0:
+            st.success("All tags are in the categories file and all IDs are valid.")
+        else:
+            st.caption(
+                f"{issues['Custom_Problem_ID'].nunique()} problem(s) need attention: tags "
+                "missing from the categories file, focus tags not among the main tags, "
+                "or malformed and duplicate IDs."
+            )
+            st.dataframe(issues, hide_index=True)
 
-        # Now split safely, avoiding the issue of NaN
-        category = category.split(", ") if category else []
-        subcategory = subcategory.split(", ") if subcategory else []
-        focus_category = focus_category.split(", ") if focus_category else []
-        focus_subcategory = focus_subcategory.split(", ") if focus_subcategory else []
+        with st.expander("Memory usage"):
+            st.caption("Bytes held in this process for the problem table.")
+            st.dataframe(self.memory_report(), hide_index=True)
 
-        return category, subcategory, focus_category, focus_subcategory
+    def display_profiling(self, profiler):
+        """
+        Collapsible sidebar panel with the timing spans of this session's reruns.
+        """
+        with st.sidebar.expander("Profiling"):
+            spans = profiler.last_rerun()
+            if spans:
+                st.caption(f"Previous rerun: {spans[-1]['duration'] * 1000:.1f} ms")
+                st.dataframe(
+                    [
+                        {
+                            "Span": "  " * span["depth"] + span["name"],
+                            "ms": round(span["duration"] * 1000, 2),
+                            "Rows": span["counters"].get("rows"),
+                            "Bytes": span["counters"].get("bytes"),
+                        }
+                        for span in spans
+                        if span["name"] != "rerun"
+                    ],
+                    hide_index=True,
+                )
+            summary = profiler.summary()
+            if summary:
+                st.caption(f"This session ({profiler.reruns} reruns)")
+                st.dataframe(
+                    [
+                        {"Span": name, **{k: round(v, 2) for k, v in entry.items()}}
+                        for name, entry in sorted(
+                            summary.items(), key=lambda item: -item[1]["total_ms"]
+                        )
+                    ],
+                    hide_index=True,
+                )
+            st.download_button(
+                "Download Chrome trace",
+                profiler.chrome_trace(),
+                file_name="problem-db-trace.json",
+                mime="application/json",
+            )
+
+            if st.button("Profile next rerun"):
+                profiler.profile_next = True
+                st.rerun()
+            if profiler.profile_stats:
+                st.download_button(
+                    "Download cProfile data",
+                    profiler.profile_dump,
+                    file_name="problem-db-rerun.prof",
+                )
+                st.code(profiler.profile_stats)
+
+    def session_row_versions(self):
+        """
+        Problem ID -> the version this session's edits to it are based on, for this bank.
+        """
+        versions = st.session_state.setdefault("row_versions", {})
+        return versions.setdefault(self.storage.key, {})
+
+    def show_conflict(self, problem_id, error):
+        """
+        Explain an edit conflict and show the problem as it is now.
+        The session's expected version moves to the current one, so acting again
+        after reviewing it goes through.
+        """
+        st.warning(str(error))
+        if problem_id in self.table:
+            st.dataframe(self.table.rows([problem_id]), hide_index=True)
+        self.session_row_versions()[problem_id] = self.row_version(problem_id)
 
     def save_changes(
-        self, problem_id, category, subcategory, year, focus_category, focus_subcategory
+        self,
+        problem_id,
+        category,
+        subcategory,
+        year,
+        focus_category,
+        focus_subcategory,
+        expected_version=None,
     ):
         """
         Save the changes made to an existing problem.
         """
-        self.df.loc[
-            self.df["Custom_Problem_ID"] == problem_id,
-            ["Category", "Subcategory", "Year", "Focus_Category", "Focus_Subcategory"],
-        ] = [
-            ", ".join(category),
-            ", ".join(subcategory),
-            year,
-            ", ".join(focus_category),
-            ", ".join(focus_subcategory),
-        ]
-        self.save_database()
-        st.success("Changes saved successfully!")
-
-    def delete_problem(self, problem_id):
+        try:
+            super().save_changes(
+                problem_id,
+                category,
+                subcategory,
+                year,
+                focus_category,
+                focus_subcategory,
+                expected_version,
+            )
+        except ConflictError as error:
+            self.show_conflict(problem_id, error)
+        except ValueError as error:
+            st.error(str(error))
+        else:
+            self.session_row_versions()[problem_id] = self.row_version(problem_id)
+            st.success("Changes saved successfully!")
+
+    def bulk_edit(self, problem_ids, operations, expected_versions=None):
+        """
+        Apply a bulk edit, reporting the outcome.
+        """
+        try:
+            diff = super().bulk_edit(problem_ids, operations, expected_versions)
+        except ConflictError as error:
+            st.warning(f"Nothing was changed: {error}")
+        except ValueError as error:
+            st.error(str(error))
+        else:
+            versions = self.session_row_versions()
+            for problem_id in diff["Custom_Problem_ID"].unique():
+                versions.pop(problem_id, None)
+            n_changed = diff["Custom_Problem_ID"].nunique()
+            st.success(f"Updated {n_changed} problem(s) in one save.")
+
+    def delete_problem(self, problem_id, expected_version=None):
         """
         Delete the selected problem from the database.
         """
-        self.df = self.df[self.df["Custom_Problem_ID"] != problem_id]
-        self.save_database()
-        st.success("Problem deleted successfully!")
+        try:
+            super().delete_problem(problem_id, expected_version)
+        except ConflictError as error:
+            self.show_conflict(problem_id, error)
+        except ValueError as error:
+            st.error(str(error))
+        else:
+            self.session_row_versions().pop(problem_id, None)
+            st.success("Problem deleted successfully!")
+
+
+def main(db_file=None, categories_file=None, bank=None):
+    """
+    Render the app for one problem bank: the given files, the named bank of the
+    registry (banks.json), or the registry bank picked in the sidebar.
+    """
+    if db_file is None:
+        db_file, categories_file, sqlite_path = choose_bank(bank)
+    else:
+        sqlite_path = None
+    # PROBLEM_DB_PROFILE=1 records per-rerun timings and adds a Profiling panel
+    if not os.environ.get("PROBLEM_DB_PROFILE"):
+        render(db_file, categories_file, sqlite_path)
+        return
+    profiler = st.session_state.setdefault("profiler", Profiler())
+    with profiler.rerun():
+        app = render(db_file, categories_file, sqlite_path)
+        app.display_profiling(profiler)
+
+
+def choose_bank(bank=None):
+    """
+    Return (problems CSV, categories CSV, SQLite path or None) of the bank named, or
+    else of the one picked in the sidebar; ?bank=<name> in the URL preselects it.
+    """
+    try:
+        banks = load_registry()
+    except ValueError as error:
+        st.error(str(error))
+        st.stop()
+    if bank is None:
+        names = list(banks)
+        requested = st.query_params.get("bank")
+        bank = st.sidebar.selectbox(
+            "Problem bank",
+            names,
+            index=names.index(requested) if requested in banks else 0,
+            format_func=lambda name: banks[name]["title"],
+        )
+        st.query_params["bank"] = bank
+    elif bank not in banks:
+        st.error(f"Bank {bank!r} is not in the registry!")
+        st.stop()
+    entry = banks[bank]
+    return entry["db"], entry["categories"], entry.get("sqlite")
+
+
+def render(db_file, categories_file, sqlite_path=None):
+    """
+    Build the app for this rerun and draw the selected page.
+    """
+    # PROBLEM_DB_SQLITE=db/incho.sqlite serves a database made by `python storage.py`
+    sqlite_path = sqlite_path or os.environ.get("PROBLEM_DB_SQLITE")
+    if sqlite_path:
+        storage = SqliteStorage(sqlite_path)
+    else:
+        storage = CsvStorage(db_file, categories_file, journal=True)
+    # Undo steps belong to one bank, so a session keeps a history per bank
+    histories = st.session_state.setdefault("history", {})
+    app = ProblemDatabaseApp(
+        storage=storage,
+        background_writes=True,
+        backups=BackupStore(default_backup_dir(sqlite_path or db_file)),
+        history=histories.setdefault(storage.key, UndoHistory()),
+    )
+    page = st.sidebar.radio("Page", ["Problems", "Statistics"], horizontal=True)
+    app.display_sidebar()
+    if page == "Statistics":
+        app.display_statistics()
+    else:
+        app.display_problems()
+    if app.history is not None:
+        app.display_history()
+    return app
 
 
 if __name__ == "__main__":
-    app = ProblemDatabaseApp(db_file="db/incho_db.csv", categories_file="categories/incho_categories.csv")
-    app.display_sidebar()
-    app.display_problems()
+    main()
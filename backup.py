@@ -0,0 +1,340 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+import zlib
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from journal import replace_atomically
+
+# Automatic snapshots live in .backup/<bank name>/, next to the hand-made copies
+BACKUP_ROOT = ".backup"
+# Average rows per chunk: a chunk ends after each row whose checksum is 0 mod this
+CHUNK_ROWS = 128
+# Take an automatic snapshot once this many writes or seconds passed since the last one
+BACKUP_EVERY_SAVES = 50
+BACKUP_EVERY_SECONDS = 15 * 60
+# Retention: the newest snapshots, plus the newest of each of the last days and weeks
+KEEP_LAST = 20
+KEEP_DAILY = 14
+KEEP_WEEKLY = 8
+
+
+def default_backup_dir(path):
+    """
+    Snapshot directory for the bank stored at path (its CSV or SQLite file).
+    """
+    return os.path.join(BACKUP_ROOT, os.path.splitext(os.path.basename(path))[0])
+
+
+def chunk_lines(text, chunk_rows=CHUNK_ROWS):
+    """
+    Split CSV text into chunks of whole lines, the header being a chunk of its own.
+    Boundaries depend only on the content of the line that ends a chunk, so an edit,
+    insert or delete changes the chunk it lands in and leaves the others identical.
+    """
+    lines = text.splitlines(keepends=True)
+    if not lines:
+        return []
+    chunks = [lines[0]]
+    current = []
+    for line in lines[1:]:
+        current.append(line)
+        if zlib.crc32(line.encode("utf-8")) % chunk_rows == 0:
+            chunks.append("".join(current))
+            current = []
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+class BackupStore:
+    """
+    Deduplicated snapshots of a problem bank.
+
+    Each file of a snapshot (the problems and the categories, as CSV text) is cut into
+    content-defined chunks of rows, and every chunk is stored once, zlib-compressed,
+    under its SHA-256 in objects/. A snapshot is a small JSON manifest in snapshots/
+    listing its chunks, so storage grows with the rows that changed between snapshots
+    rather than with the bank size times the number of snapshots. Restoring reads and
+    joins a snapshot's chunks; diffing two snapshots only decodes the chunks they don't
+    share.
+    """
+
+    def __init__(
+        self,
+        directory,
+        every_saves=BACKUP_EVERY_SAVES,
+        every_seconds=BACKUP_EVERY_SECONDS,
+    ):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, "objects")
+        self.snapshots_dir = os.path.join(directory, "snapshots")
+        self.every_saves = every_saves
+        self.every_seconds = every_seconds
+        self._manifests = {}
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def _put(self, chunk):
+        # Store a chunk unless it is already there; return (digest, bytes written)
+        data = chunk.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = zlib.compress(data)
+
+        def write(tmp_path):
+            with open(tmp_path, "wb") as out:
+                out.write(compressed)
+
+        replace_atomically(path, write)
+        return digest, len(compressed)
+
+    def _get(self, digest):
+        with open(self._object_path(digest), "rb") as chunk:
+            return zlib.decompress(chunk.read()).decode("utf-8")
+
+    def ids(self):
+        """
+        Snapshot IDs, oldest first.
+        """
+        if not os.path.isdir(self.snapshots_dir):
+            return []
+        return sorted(
+            name[: -len(".json")]
+            for name in os.listdir(self.snapshots_dir)
+            if name.endswith(".json")
+        )
+
+    def manifest(self, snapshot_id):
+        """
+        The manifest of a snapshot; ValueError if there is no such snapshot.
+        """
+        if snapshot_id not in self._manifests:
+            path = os.path.join(self.snapshots_dir, snapshot_id + ".json")
+            try:
+                with open(path, encoding="utf-8") as manifest:
+                    self._manifests[snapshot_id] = json.load(manifest)
+            except FileNotFoundError:
+                raise ValueError(f"Backup {snapshot_id!r} does not exist!") from None
+        return self._manifests[snapshot_id]
+
+    def latest(self):
+        """
+        The newest snapshot's manifest, or None if there is none.
+        """
+        ids = self.ids()
+        return self.manifest(ids[-1]) if ids else None
+
+    def history(self):
+        """
+        One row per snapshot, oldest first: ID, creation time, bank version, reason,
+        rows, and the changed chunks and compressed bytes it added to the store.
+        """
+        columns = [
+            "ID",
+            "Created",
+            "Version",
+            "Reason",
+            "Rows",
+            "Changed chunks",
+            "New bytes",
+        ]
+        rows = [
+            [
+                manifest["id"],
+                manifest["created"],
+                manifest["version"],
+                manifest["reason"],
+                manifest["files"]["problems"]["rows"],
+                manifest["new_chunks"],
+                manifest["new_bytes"],
+            ]
+            for manifest in map(self.manifest, self.ids())
+        ]
+        return pd.DataFrame(rows, columns=columns)
+
+    def due(self, version):
+        """
+        Whether an automatic snapshot is due at this bank version.
+        """
+        latest = self.latest()
+        if latest is None:
+            return True
+        return (
+            not 0 <= version - latest["version"] < self.every_saves
+            or time.time() - latest["timestamp"] >= self.every_seconds
+        )
+
+    def snapshot(self, files, version, reason="auto"):
+        """
+        Store a snapshot of files ({"problems": csv_text, "categories": csv_text}) and
+        return its manifest. If nothing changed since the latest snapshot, that one is
+        returned and nothing is written.
+        """
+        now = time.time()
+        manifest = {
+            "files": {},
+            "version": version,
+            "reason": reason,
+            "timestamp": now,
+            "created": datetime.fromtimestamp(now, timezone.utc).isoformat(
+                timespec="seconds"
+            ),
+            "new_chunks": 0,
+            "new_bytes": 0,
+        }
+        for name, text in files.items():
+            chunks = chunk_lines(text)
+            digests = []
+            for chunk in chunks:
+                digest, written = self._put(chunk)
+                digests.append(digest)
+                manifest["new_chunks"] += written > 0
+                manifest["new_bytes"] += written
+            manifest["files"][name] = {
+                "chunks": digests,
+                "rows": max(0, text.count("\n") - 1),
+                "bytes": len(text.encode("utf-8")),
+            }
+
+        chunk_lists = {name: entry["chunks"] for name, entry in manifest["files"].items()}
+        manifest["content"] = hashlib.sha256(
+            json.dumps(chunk_lists, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        latest = self.latest()
+        if latest is not None and latest["content"] == manifest["content"]:
+            return latest
+        # IDs sort by creation time
+        stamp = datetime.fromtimestamp(now, timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        manifest["id"] = f"{stamp}-{manifest['content'][:8]}"
+
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+
+        def write(path):
+            with open(path, "w", encoding="utf-8") as out:
+                json.dump(manifest, out, indent=1)
+
+        path = os.path.join(self.snapshots_dir, manifest["id"] + ".json")
+        replace_atomically(path, write)
+        self._manifests[manifest["id"]] = manifest
+        return manifest
+
+    def read(self, snapshot_id, name):
+        """
+        Rebuild the text of one file of a snapshot.
+        """
+        return "".join(map(self._get, self.manifest(snapshot_id)["files"][name]["chunks"]))
+
+    def frames(self, snapshot_id):
+        """
+        Return a snapshot as (problems, categories) DataFrames.
+        """
+        return tuple(
+            pd.read_csv(io.StringIO(self.read(snapshot_id, name)))
+            for name in ("problems", "categories")
+        )
+
+    def _rows(self, digests, header):
+        # Problem ID -> CSV line for the rows in the given chunks
+        id_column = header.index("Custom_Problem_ID")
+        rows = {}
+        for digest in digests:
+            for line in self._get(digest).splitlines():
+                values = next(csv.reader([line]), None)
+                if values:
+                    rows[values[id_column]] = line
+        return rows
+
+    def diff(self, old_id, new_id):
+        """
+        What changed from one snapshot to another: a DataFrame with the Problem IDs
+        that were added, removed or changed, and the (Category, Subcategory) pairs
+        that were added or removed. Only the chunks the snapshots don't share are read.
+        """
+        old, new = self.manifest(old_id), self.manifest(new_id)
+        old_chunks = old["files"]["problems"]["chunks"]
+        new_chunks = new["files"]["problems"]["chunks"]
+        changes = []
+        if old_chunks != new_chunks:
+            header = next(csv.reader([self._get(new_chunks[0])]))
+            shared = set(old_chunks) & set(new_chunks)
+            before = self._rows([d for d in old_chunks[1:] if d not in shared], header)
+            after = self._rows([d for d in new_chunks[1:] if d not in shared], header)
+            for problem_id, line in after.items():
+                if problem_id not in before:
+                    changes.append(("problem", problem_id, "added"))
+                elif before[problem_id] != line:
+                    changes.append(("problem", problem_id, "changed"))
+            changes.extend(
+                ("problem", problem_id, "removed")
+                for problem_id in before
+                if problem_id not in after
+            )
+
+        if old["files"]["categories"]["chunks"] != new["files"]["categories"]["chunks"]:
+            before, after = (
+                set(self.frames(snapshot_id)[1].itertuples(index=False, name=None))
+                for snapshot_id in (old_id, new_id)
+            )
+            changes.extend(
+                ("category", f"{category} / {sub}", "added")
+                for category, sub in sorted(after - before)
+            )
+            changes.extend(
+                ("category", f"{category} / {sub}", "removed")
+                for category, sub in sorted(before - after)
+            )
+        return pd.DataFrame(changes, columns=["Kind", "Item", "Change"])
+
+    def prune(
+        self,
+        keep_last=KEEP_LAST,
+        keep_daily=KEEP_DAILY,
+        keep_weekly=KEEP_WEEKLY,
+    ):
+        """
+        Apply the retention policy: keep the keep_last newest snapshots and the newest
+        snapshot of each of the keep_daily latest days and keep_weekly latest weeks
+        that have one. Other snapshots are deleted, then every chunk no remaining
+        snapshot uses. Returns (snapshots deleted, chunks deleted).
+        """
+        ids = self.ids()
+        keep = set(ids[-keep_last:] if keep_last else [])
+        for limit, period in ((keep_daily, "%Y-%m-%d"), (keep_weekly, "%G-W%V")):
+            newest = {}
+            for snapshot_id in ids:
+                created = datetime.fromtimestamp(
+                    self.manifest(snapshot_id)["timestamp"], timezone.utc
+                )
+                newest[created.strftime(period)] = snapshot_id
+            keep.update(newest[key] for key in sorted(newest)[-limit:] if limit)
+
+        removed = [snapshot_id for snapshot_id in ids if snapshot_id not in keep]
+        for snapshot_id in removed:
+            os.remove(os.path.join(self.snapshots_dir, snapshot_id + ".json"))
+            self._manifests.pop(snapshot_id, None)
+
+        used = {
+            digest
+            for snapshot_id in keep
+            for entry in self.manifest(snapshot_id)["files"].values()
+            for digest in entry["chunks"]
+        }
+        deleted = 0
+        if os.path.isdir(self.objects_dir):
+            for prefix in os.listdir(self.objects_dir):
+                directory = os.path.join(self.objects_dir, prefix)
+                for rest in os.listdir(directory):
+                    if prefix + rest not in used:
+                        os.remove(os.path.join(directory, rest))
+                        deleted += 1
+        return len(removed), deleted
@@ -0,0 +1,355 @@
+"""
+Benchmark the problem bank operations on synthetic banks, without a browser.
+
+    python bench.py                                  # 1k, 10k, 100k and 1M problems
+    python bench.py --sizes 1000 10000 --output bench.json
+    python bench.py --sizes 10000 --compare bench.json   # flag regressions
+
+Each size gets a generated bank shaped like db/incho_db.csv (multi-tag rows, a
+skewed tag popularity, some subcategory names shared between categories) in a
+temporary directory. Results are written as JSON: per size, per operation, the
+number of runs and the mean/median/p95/min time in milliseconds.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from engine import ProblemDatabase
+from state_cache import STATE_CACHE
+from tags import join_tags
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# Timed runs of each single-problem operation per size
+DEFAULT_OPS = 100
+# Timed full loads (and category loads) per size
+LOAD_RUNS = 3
+# A run this much slower than the baseline counts as a regression
+DEFAULT_THRESHOLD = 1.25
+
+# Tags per problem, as observed in the incho bank: {count: probability}
+CATEGORY_COUNTS = {0: 0.05, 1: 0.6, 2: 0.25, 3: 0.07, 4: 0.03}
+SUBCATEGORY_COUNTS = {0: 0.1, 1: 0.45, 2: 0.3, 3: 0.1, 4: 0.05}
+FOCUS_COUNTS = {0: 0.15, 1: 0.65, 2: 0.2}
+# Years the generated problems are from, and problem numbers per ID year (P01-P99,
+# then P00); a YYYY_PXX ID has room for 10,000 years of 100 problems
+YEARS = list(range(2000, 2026))
+PROBLEMS_PER_ID_YEAR = 100
+
+
+def _draw(rng, counts):
+    return rng.choices(list(counts), weights=list(counts.values()))[0]
+
+
+def _sample(rng, population, weights, k):
+    # k distinct items, popular ones more likely
+    chosen = []
+    for item in rng.choices(population, weights=weights, k=2 * k):
+        if item not in chosen:
+            chosen.append(item)
+        if len(chosen) == k:
+            break
+    return chosen
+
+
+def generate_taxonomy(n_categories=40, seed=0):
+    """
+    Return a (Category, Subcategory) DataFrame with 2-12 subcategories per category;
+    about a quarter of the categories share an "Introduction" subcategory.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_categories):
+        category = f"Category {i:02d}"
+        subs = [f"Topic {i:02d}.{j}" for j in range(rng.randint(2, 12))]
+        if rng.random() < 0.25:
+            subs[0] = "Introduction"
+        rows.extend((category, sub) for sub in subs)
+    return pd.DataFrame(rows, columns=["Category", "Subcategory"])
+
+
+def generate_problems(n_problems, taxonomy, seed=0):
+    """
+    Return n_problems synthetic problems for a taxonomy from generate_taxonomy.
+    IDs follow the YYYY_PXX pattern at every size: the Year column cycles through
+    YEARS, and once those run out of two-digit problem numbers the IDs use further
+    years (from 2000 on, or from 0000 for the largest banks) than the Year column.
+    Category popularity is Zipf-like; subcategories and focus tags are drawn from
+    the problem's own categories.
+    """
+    rng = random.Random(seed)
+    subcategories = taxonomy.groupby("Category", sort=False)["Subcategory"].agg(list)
+    categories = subcategories.index.tolist()
+    weights = [1 / (rank + 1) for rank in range(len(categories))]
+
+    id_years = max(len(YEARS), -(-n_problems // PROBLEMS_PER_ID_YEAR))
+    if id_years > 10_000:
+        raise ValueError(f"YYYY_PXX IDs cannot number {n_problems} problems!")
+    first_id_year = min(YEARS[0], 10_000 - id_years)
+    rows = []
+    for i in range(n_problems):
+        year = YEARS[i % len(YEARS)]
+        id_year = first_id_year + i % id_years
+        number = (i // id_years + 1) % PROBLEMS_PER_ID_YEAR
+        chosen = _sample(rng, categories, weights, _draw(rng, CATEGORY_COUNTS))
+        pool = [sub for category in chosen for sub in subcategories[category]]
+        subs = rng.sample(pool, min(len(pool), _draw(rng, SUBCATEGORY_COUNTS)))
+        focus = rng.sample(chosen, min(len(chosen), _draw(rng, FOCUS_COUNTS)))
+        focus_subs = rng.sample(subs, min(len(subs), _draw(rng, FOCUS_COUNTS)))
+        rows.append(
+            (
+                f"{id_year:04d}_P{number:02d}",
+                join_tags(chosen),
+                join_tags(subs),
+                year,
+                join_tags(focus),
+                join_tags(focus_subs),
+            )
+        )
+    return pd.DataFrame(
+        rows,
+        columns=[
+            "Custom_Problem_ID",
+            "Category",
+            "Subcategory",
+            "Year",
+            "Focus_Category",
+            "Focus_Subcategory",
+        ],
+    )
+
+
+def summarize(timings):
+    """
+    Summarize a list of durations in seconds as milliseconds.
+    """
+    ms = sorted(t * 1000 for t in timings)
+    return {
+        "runs": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "median_ms": round(statistics.median(ms), 4),
+        "p95_ms": round(ms[min(len(ms) - 1, int(0.95 * len(ms)))], 4),
+        "min_ms": round(ms[0], 4),
+    }
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def bench_size(n_problems, n_ops=DEFAULT_OPS, journal=True, seed=0):
+    """
+    Generate a bank of n_problems in a temporary directory and time each operation.
+    Returns {operation: summary}.
+    """
+    directory = tempfile.mkdtemp(prefix="problem-bench-")
+    try:
+        db_file = os.path.join(directory, "bench_db.csv")
+        categories_file = os.path.join(directory, "bench_categories.csv")
+        taxonomy = generate_taxonomy(seed=seed)
+        taxonomy.to_csv(categories_file, index=False)
+        generate_problems(n_problems, taxonomy, seed=seed).to_csv(db_file, index=False)
+        return _run(db_file, categories_file, taxonomy, n_ops, journal, seed)
+    finally:
+        STATE_CACHE.invalidate()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _run(db_file, categories_file, taxonomy, n_ops, journal, seed):
+    rng = random.Random(seed)
+    results = {}
+
+    def new_db():
+        return ProblemDatabase(db_file, categories_file, journal=journal)
+
+    # Loads: parsing the CSV (which also writes the snapshot), the snapshot, then
+    # the process-wide cache that Streamlit reruns hit
+    STATE_CACHE.invalidate()
+    db = new_db()
+    loads = {"load_database (csv)": [], "load_database (snapshot)": []}
+    for _ in range(LOAD_RUNS):
+        for label, times in loads.items():
+            snapshot = db.storage.snapshot_file
+            if label == "load_database (csv)" and snapshot and os.path.exists(snapshot):
+                os.remove(snapshot)
+            STATE_CACHE.invalidate()
+            elapsed, db.table = timed(db.load_database)
+            times.append(elapsed)
+    results.update({label: summarize(times) for label, times in loads.items()})
+    results["load_database (cached)"] = summarize(
+        [timed(db.load_database)[0] for _ in range(n_ops)]
+    )
+    cold = []
+    for _ in range(LOAD_RUNS):
+        STATE_CACHE.invalidate()
+        cold.append(timed(db.load_categories_and_subcategories)[0])
+    results["load_categories_and_subcategories"] = summarize(cold)
+
+    categories = taxonomy["Category"].unique().tolist()
+    subcategories = taxonomy["Subcategory"].unique().tolist()
+    ids = db.df["Custom_Problem_ID"].tolist()
+
+    def random_tags(pool, k):
+        return rng.sample(pool, k)
+
+    # Problems are deleted and then added back, so the added IDs are free and valid
+    # whatever the bank size
+    readded = rng.sample(ids, min(n_ops, len(ids)))
+    results["delete_problem"] = summarize(
+        [timed(db.delete_problem, problem_id)[0] for problem_id in readded]
+    )
+    results["add_problem"] = summarize(
+        [
+            timed(
+                db.add_problem,
+                problem_id,
+                random_tags(categories, 2),
+                random_tags(subcategories, 2),
+                rng.choice(YEARS),
+                random_tags(categories, 1),
+                [],
+            )[0]
+            for problem_id in readded
+        ]
+    )
+    results["save_changes"] = summarize(
+        [
+            timed(
+                db.save_changes,
+                problem_id,
+                random_tags(categories, 2),
+                random_tags(subcategories, 3),
+                2020,
+                [],
+                random_tags(subcategories, 1),
+            )[0]
+            for problem_id in rng.sample(ids, min(n_ops, len(ids)))
+        ]
+    )
+    positions = [db.table.position(problem_id) for problem_id in rng.sample(ids, n_ops)]
+    results["get_current_values"] = summarize(
+        [timed(db.get_current_values, position)[0] for position in positions]
+    )
+    results["find_problems (1 tag)"] = summarize(
+        [
+            timed(db.find_problems, {"Subcategory": random_tags(subcategories, 1)})[0]
+            for _ in range(n_ops)
+        ]
+    )
+    results["find_problems (2 fields)"] = summarize(
+        [
+            timed(
+                db.find_problems,
+                {
+                    "Category": random_tags(categories[:5], 1),
+                    "Subcategory": random_tags(subcategories, 1),
+                },
+            )[0]
+            for _ in range(n_ops)
+        ]
+    )
+    results["search"] = summarize(
+        [
+            timed(db.search, rng.choice(ids)[: rng.randint(3, 8)])[0]
+            for _ in range(n_ops)
+        ]
+    )
+    results["save_database"] = summarize(
+        [timed(db.save_database)[0] for _ in range(3)]
+    )
+    return results
+
+
+def environment():
+    """
+    Versions and machine details stored with the results, to tell runs apart.
+    """
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Return (size, operation, baseline ms, current ms) for each operation whose median
+    got slower than threshold x the baseline's.
+    """
+    regressions = []
+    for size, operations in results["results"].items():
+        for operation, summary in operations.items():
+            before = baseline.get("results", {}).get(size, {}).get(operation)
+            if before and summary["median_ms"] > threshold * before["median_ms"]:
+                regressions.append(
+                    (size, operation, before["median_ms"], summary["median_ms"])
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument(
+        "--ops", type=int, default=DEFAULT_OPS, help="Runs per single-problem operation"
+    )
+    parser.add_argument(
+        "--no-journal",
+        dest="journal",
+        action="store_false",
+        help="Rewrite the CSV on every edit instead of appending to the journal",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="Baseline JSON results to check against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    results = {
+        "environment": environment(),
+        "settings": {"ops": args.ops, "journal": args.journal, "seed": args.seed},
+        "results": {},
+    }
+    for size in args.sizes:
+        print(f"Benchmarking {size} problems...", file=sys.stderr)
+        results["results"][str(size)] = bench_size(
+            size, args.ops, args.journal, args.seed
+        )
+        for operation, summary in results["results"][str(size)].items():
+            print(f"  {operation:36} {summary['median_ms']:10.3f} ms", file=sys.stderr)
+
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(results, output, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.threshold)
+        for size, operation, before, after in regressions:
+            print(
+                f"REGRESSION {size} {operation}: {before:.3f} ms -> {after:.3f} ms",
+                file=sys.stderr,
+            )
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
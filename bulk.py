@@ -0,0 +1,108 @@
+import re
+
+import pandas as pd
+
+from importer import YEAR_RANGE, known_tags
+from tags import TAG_FIELDS, add_tags, join_tags, rewrite_tags
+
+# Operation name -> what it does; an operation is (name, field, value)
+BULK_OPERATIONS = {
+    "add_tags": "Add tags",
+    "remove_tags": "Remove tags",
+    "set_focus": "Set focus tags",
+    "set_year": "Set year",
+}
+FOCUS_FIELDS = ["Focus_Category", "Focus_Subcategory"]
+
+
+def select_rows(df, years=None, id_pattern=None):
+    """
+    Narrow df to the problems with a Year in the inclusive (first, last) range years
+    and an ID matching id_pattern, a shell-style pattern such as "2015_*" or "20?0_P0*".
+    """
+    mask = pd.Series(True, index=df.index)
+    if years is not None:
+        first, last = years
+        mask &= df["Year"].between(first, last)
+    if id_pattern:
+        # Translated by hand: fnmatch.translate() emits syntax Arrow's regex engine lacks
+        regex = re.escape(id_pattern.strip()).replace(r"\*", ".*").replace(r"\?", ".")
+        mask &= df["Custom_Problem_ID"].astype(str).str.fullmatch(regex)
+    return df[mask]
+
+
+def check_operations(operations, categories, subcategories):
+    """
+    Raise ValueError unless every (name, field, value) operation can be applied.
+    """
+    if not operations:
+        raise ValueError("Choose at least one change to apply!")
+    known = known_tags(categories, subcategories)
+    for name, field, value in operations:
+        if name not in BULK_OPERATIONS:
+            raise ValueError(f"Unknown bulk operation {name!r}!")
+        if name == "set_year":
+            if not YEAR_RANGE[0] <= int(value) <= YEAR_RANGE[1]:
+                raise ValueError(
+                    f"Year must be between {YEAR_RANGE[0]} and {YEAR_RANGE[1]}!"
+                )
+            continue
+        if field not in (FOCUS_FIELDS if name == "set_focus" else TAG_FIELDS):
+            raise ValueError(f"Cannot {BULK_OPERATIONS[name].lower()} in {field}!")
+        if name != "set_focus" and not value:
+            raise ValueError("Choose the tags to add or remove!")
+        unknown = [tag for tag in value if tag not in known[field]]
+        if unknown:
+            raise ValueError(
+                f"Unknown {field.replace('_', ' ')}: {', '.join(unknown)}!"
+            )
+
+
+def apply_operations(df, operations):
+    """
+    Return a copy of df with the operations applied, in order, one column at a time.
+    Tag strings are rewritten once per distinct value, not once per row.
+    """
+    edited = df.copy()
+    for name, field, value in operations:
+        if name == "set_year":
+            edited["Year"] = int(value)
+        elif name == "set_focus":
+            edited[field] = join_tags(value)
+        elif name == "add_tags":
+            edited[field] = add_tags(edited[field], value)
+        else:
+            edited[field] = rewrite_tags(edited[field], dict.fromkeys(value))
+    return edited
+
+
+def _text(values):
+    # Cell values as strings for comparing and showing, missing ones as ""
+    values = values.astype(object)
+    return values.where(values.notna(), "").astype(str).to_numpy()
+
+
+def edit_diff(before, after):
+    """
+    The cells that differ between two frames of the same problems, as a DataFrame of
+    Custom_Problem_ID, Field, Before and After.
+    """
+    changes = []
+    for column in [column for column in after.columns if column != "Custom_Problem_ID"]:
+        old, new = _text(before[column]), _text(after[column])
+        changed = old != new
+        changes.append(
+            pd.DataFrame(
+                {
+                    "Custom_Problem_ID": after["Custom_Problem_ID"].to_numpy()[changed],
+                    "Field": column,
+                    "Before": old[changed],
+                    "After": new[changed],
+                }
+            )
+        )
+    diff = pd.concat(changes, ignore_index=True)
+    order = {problem_id: i for i, problem_id in enumerate(after["Custom_Problem_ID"])}
+    return diff.sort_values(
+        "Custom_Problem_ID", key=lambda ids: ids.map(order), kind="stable"
+    ).reset_index(drop=True)
@@ -0,0 +1,204 @@
+"""
+Command-line access to a problem bank without starting Streamlit.
+
+    python cli.py add 2030_P01 --year 2030 --category "The Atom" --subcategory Introduction
+    python cli.py edit 2030_P01 --focus-category "The Atom"
+    python cli.py delete 2030_P01
+    python cli.py query --subcategory "Rate law"
+    python cli.py search "rate la"
+    python cli.py export --format html --category "The Atom" --output atom.html
+    python cli.py stats
+    python cli.py memory
+    python cli.py check
+    python cli.py backup
+    python cli.py backups
+    python cli.py diff 20261017T101500000000Z-1a2b3c4d 20261017T120000000000Z-5e6f7a8b
+    python cli.py restore 20261017T101500000000Z-1a2b3c4d
+"""
+
+import argparse
+import json
+import sys
+
+from backup import BackupStore, default_backup_dir
+from engine import ProblemDatabase
+from export import EXPORT_FORMATS, export_chunks
+from storage import SqliteStorage
+from tags import TAG_FIELDS
+
+# --category, --subcategory, --focus-category, --focus-subcategory
+TAG_OPTIONS = {field: "--" + field.lower().replace("_", "-") for field in TAG_FIELDS}
+
+
+def add_tag_options(parser, help_text):
+    for field, option in TAG_OPTIONS.items():
+        parser.add_argument(
+            option,
+            dest=field,
+            action="append",
+            metavar="TAG",
+            help=help_text.format(field.replace("_", " ").lower()),
+        )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default="db/incho_db.csv", help="Problem CSV")
+    parser.add_argument(
+        "--categories", default="categories/incho_categories.csv", help="Categories CSV"
+    )
+    parser.add_argument("--sqlite", help="Use this SQLite database instead of the CSVs")
+    parser.add_argument(
+        "--no-journal",
+        dest="journal",
+        action="store_false",
+        help="Rewrite the CSV on every edit instead of appending to the journal",
+    )
+    parser.add_argument(
+        "--backup-dir", help="Snapshot directory (default: .backup/<bank name>)"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Add a problem")
+    add.add_argument("problem_id")
+    add.add_argument("--year", type=int, required=True)
+    add_tag_options(add, "A {} (repeat for several)")
+
+    edit = commands.add_parser(
+        "edit", help="Change a problem; omitted fields keep their values"
+    )
+    edit.add_argument("problem_id")
+    edit.add_argument("--year", type=int)
+    add_tag_options(edit, "Replace the {} list (repeat for several)")
+
+    delete = commands.add_parser("delete", help="Delete a problem")
+    delete.add_argument("problem_id")
+
+    query = commands.add_parser("query", help="List problems carrying all given tags")
+    add_tag_options(query, "Required {} (repeat for several)")
+    query.add_argument("--year", type=int)
+    query.add_argument("--format", choices=["table", "csv", "jsonl"], default="table")
+
+    export = commands.add_parser(
+        "export", help="Stream the problems carrying all given tags to a file"
+    )
+    add_tag_options(export, "Required {} (repeat for several)")
+    export.add_argument("--year", type=int)
+    export.add_argument("--format", choices=list(EXPORT_FORMATS), default="jsonl")
+    export.add_argument("--title", default="Practice problems", help="Sheet title")
+    export.add_argument("--output", help="File to write (default: standard output)")
+
+    search = commands.add_parser("search", help="Find problem IDs and tags as you type")
+    search.add_argument("text")
+    search.add_argument("--limit", type=int, default=10)
+
+    commands.add_parser("stats", help="Print problem and tag counts as JSON")
+    commands.add_parser("memory", help="Print the bytes held per column in memory")
+    commands.add_parser(
+        "check", help="List integrity issues; exits with 2 if there are any"
+    )
+
+    commands.add_parser("backup", help="Snapshot the bank now")
+    commands.add_parser("backups", help="List the snapshots, oldest first")
+    diff = commands.add_parser("diff", help="List what changed between two snapshots")
+    diff.add_argument("old_id")
+    diff.add_argument("new_id")
+    restore = commands.add_parser("restore", help="Replace the bank with a snapshot")
+    restore.add_argument("snapshot_id")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    backup_dir = args.backup_dir or default_backup_dir(args.sqlite or args.db)
+    db = ProblemDatabase(
+        db_file=args.db,
+        categories_file=args.categories,
+        journal=args.journal,
+        storage=SqliteStorage(args.sqlite) if args.sqlite else None,
+        backups=BackupStore(backup_dir),
+    )
+    tags = {field: getattr(args, field, None) for field in TAG_FIELDS}
+
+    try:
+        if args.command == "add":
+            db.add_problem(
+                args.problem_id,
+                tags["Category"] or [],
+                tags["Subcategory"] or [],
+                args.year,
+                tags["Focus_Category"] or [],
+                tags["Focus_Subcategory"] or [],
+            )
+        elif args.command == "edit":
+            position = db.table.position(args.problem_id)
+            if position is None:
+                raise ValueError("Problem does not exist!")
+            current = dict(zip(TAG_FIELDS, db.get_current_values(position)))
+            values = {
+                field: current[field] if tags[field] is None else tags[field]
+                for field in TAG_FIELDS
+            }
+            year = db.table.row(position)["Year"] if args.year is None else args.year
+            # Refuse the edit if someone changes the problem between reading and saving it
+            db.save_changes(
+                args.problem_id,
+                values["Category"],
+                values["Subcategory"],
+                int(year),
+                values["Focus_Category"],
+                values["Focus_Subcategory"],
+                expected_version=db.row_version(args.problem_id),
+            )
+        elif args.command == "delete":
+            db.delete_problem(args.problem_id)
+        elif args.command == "query":
+            matches = db.find_problems(tags)
+            if args.year is not None:
+                matches = matches[matches["Year"] == args.year]
+            if args.format == "csv":
+                matches.to_csv(sys.stdout, index=False)
+            elif args.format == "jsonl":
+                matches.to_json(sys.stdout, orient="records", lines=True)
+            else:
+                print(matches.to_string(index=False))
+        elif args.command == "export":
+            matches = db.find_problems(tags)
+            if args.year is not None:
+                matches = matches[matches["Year"] == args.year]
+            chunks = export_chunks(matches, args.format, args.title)
+            if args.output:
+                with open(args.output, "wb") as file:
+                    file.writelines(chunks)
+            else:
+                sys.stdout.buffer.writelines(chunks)
+        elif args.command == "search":
+            for kind, text in db.search(args.text, args.limit):
+                print(f"{kind}\t{text}")
+        elif args.command == "stats":
+            print(json.dumps(db.stats(), indent=2, default=str))
+        elif args.command == "memory":
+            print(db.memory_report().to_string(index=False))
+        elif args.command == "check":
+            issues = db.check_integrity()
+            if len(issues) == 0:
+                print("No issues found.")
+                return 0
+            print(issues.to_string(index=False))
+            return 2
+        elif args.command == "backup":
+            print(db.backup(reason="manual")["id"])
+        elif args.command == "backups":
+            print(db.backups.history().to_string(index=False))
+        elif args.command == "diff":
+            print(db.diff_backups(args.old_id, args.new_id).to_string(index=False))
+        elif args.command == "restore":
+            db.restore_backup(args.snapshot_id)
+    except ValueError as error:
+        print(f"error: {error}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,956 @@
+from contextlib import contextmanager
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from analytics import CO_OCCURRENCE_PAIRS
+from bulk import apply_operations, check_operations, edit_diff, select_rows
+from importer import read_problem_file, validate_problems
+from profiling import path_bytes, traced
+from search import DEFAULT_LIMIT
+from state_cache import STATE_CACHE
+from storage import JOURNAL_COMPACT_BYTES, CsvStorage
+from table import ProblemTable, row_version
+from tags import TAG_FIELDS, join_tags
+from taxonomy import Taxonomy
+from writer import WRITER
+
+
+def _problem_io(db, table=None):
+    # Span counters for reads and writes of the whole problem table
+    table = table if table is not None else db.table
+    return {"rows": len(table.df), "bytes": path_bytes(db.storage.problem_paths())}
+
+
+def _category_io(db, loaded=None):
+    _, subcategories = loaded if loaded is not None else (None, db.subcategories)
+    return {
+        "rows": sum(len(subs) for subs in subcategories.values()),
+        "bytes": path_bytes(db.storage.category_paths()),
+    }
+
+
+def _backup_files(df, categories):
+    # The bank as CSV text, the form snapshots store it in
+    return {
+        "problems": df.to_csv(index=False),
+        "categories": categories.to_csv(index=False),
+    }
+
+
+def _table_bytes(loaded):
+    # Size of a cached (version, table) pair, for the state cache's memory budget
+    return loaded[1].nbytes()
+
+
+def _image_version(row):
+    # Row images compare by content; None (no such row) is its own version, and a
+    # duplicated ID's image (a tuple of rows) is the tuple of their versions
+    if isinstance(row, tuple):
+        return tuple(row_version(each) for each in row)
+    return None if row is None else row_version(row)
+
+
+class ConflictError(ValueError):
+    """
+    An edit was based on a version of the problem that someone else has since changed.
+    """
+
+
+class ProblemDatabase:
+    """
+    Load, query and mutate a problem bank without any UI.
+
+    Mutations raise ValueError with a user-facing message when they are rejected;
+    the Streamlit app (app.py) and the CLI (cli.py) decide how to show it.
+
+    Several sessions and processes may edit the same bank. Each mutation runs in
+    transaction(), which holds the storage's cross-process write lock and first catches
+    up with writes made elsewhere; edits that pass the version the caller last saw are
+    rejected with ConflictError if the problem has changed since. Reads never lock.
+    """
+
+    def __init__(
+        self,
+        db_file="sample_db.csv",
+        categories_file="sample_categories.csv",
+        journal=False,
+        journal_compact_bytes=JOURNAL_COMPACT_BYTES,
+        storage=None,
+        background_writes=False,
+        backups=None,
+        history=None,
+    ):
+        # Any backend from storage.py; by default the CSV files given above
+        self.storage = storage or CsvStorage(
+            db_file, categories_file, journal, journal_compact_bytes
+        )
+        # Full rewrites go through the shared, coalescing writer thread when enabled
+        self.writer = WRITER if background_writes else None
+        # A backup.BackupStore to snapshot the bank to automatically, or None
+        self.backups = backups
+        # A history.UndoHistory for this session's undoable mutations, or None
+        self.history = history
+        # Every session in the process shares the cached state; mutate it one at a time
+        self.lock = STATE_CACHE.lock(self.storage.key)
+        if self.writer is not None:
+            # Writes still queued for this bank are started as soon as its table is
+            # evicted; not waited for, as the evicting session may hold another lock
+            STATE_CACHE.on_evict(
+                ("db", self.storage.key),
+                partial(
+                    self.writer.flush,
+                    [("problems", self.storage.key), ("backup", self.storage.key)],
+                    wait=False,
+                ),
+            )
+        self.version = None
+        self._in_transaction = False
+        self.categories, self.subcategories = self.load_categories_and_subcategories()
+        self.table = self.load_database()
+
+    @property
+    def df(self):
+        """
+        The problem DataFrame; mutate it through self.table so its indexes stay in sync.
+        """
+        return self.table.df
+
+    @traced(measure=_problem_io)
+    def load_database(self):
+        """
+        Load the problem table, reusing the process-wide cached copy unless the storage changed on disk.
+        Also sets self.version to the storage version the table is at least as new as.
+        """
+        self.version, table = STATE_CACHE.get(
+            ("db", self.storage.key),
+            self.storage.problem_paths(),
+            self.read_database,
+            sizeof=_table_bytes,
+        )
+        return table
+
+    def read_database(self):
+        """
+        Read the problem table from the storage backend, with the version read before it.
+        """
+        version = self.storage.version()
+        return version, ProblemTable(self.storage.read_problems(), self.tag_vocabulary())
+
+    def tag_vocabulary(self):
+        """
+        Categories followed by subcategories, in file order; these get the lowest tag codes.
+        """
+        return self.categories + [
+            sub for subs in self.subcategories.values() for sub in subs
+        ]
+
+    @traced(measure=_category_io)
+    def load_categories_and_subcategories(self):
+        """
+        Load categories and subcategories, reusing the process-wide cached copy unless the storage changed on disk.
+        """
+        return STATE_CACHE.get(
+            ("categories", self.storage.key),
+            self.storage.category_paths(),
+            self.read_categories_and_subcategories,
+        )
+
+    def read_categories_and_subcategories(self):
+        """
+        Read categories and subcategories from the storage backend.
+        """
+        df_categories = self.storage.read_categories()
+        subcategories = {}
+
+        # Populate the subcategories dictionary in one pass, categories in file order
+        pairs = df_categories[["Category", "Subcategory"]].itertuples(index=False)
+        for category, subcategory in pairs:
+            subcategories.setdefault(category, []).append(subcategory)
+
+        return list(subcategories), subcategories
+
+    @property
+    def taxonomy(self):
+        """
+        Lookups and dropdown options over the categories as last saved, built once per
+        version of the categories and shared by every session in the process.
+        """
+        categories, subcategories = self.load_categories_and_subcategories()
+        # Keyed on the cached categories list itself rather than on the files: writes
+        # that leave the categories alone keep that list, while reloading them makes a
+        # new one, and in-process edits drop the entry when they save (save_categories)
+        key = ("taxonomy", self.storage.key)
+        source, taxonomy = STATE_CACHE.get(key, (), lambda: (None, None))
+        if source is not categories:
+            taxonomy = Taxonomy(categories, subcategories)
+            STATE_CACHE.put(key, (), (categories, taxonomy))
+        return taxonomy
+
+    def publish_state(self):
+        """
+        Store the in-memory state in the process-wide cache after a write, stamped with
+        the storage's new signature so the next rerun doesn't re-read it.
+        """
+        STATE_CACHE.put(
+            ("db", self.storage.key),
+            self.storage.problem_paths(),
+            (self.version, self.table),
+            sizeof=_table_bytes,
+        )
+        STATE_CACHE.put(
+            ("categories", self.storage.key),
+            self.storage.category_paths(),
+            (self.categories, self.subcategories),
+        )
+
+    @contextmanager
+    def transaction(self, label=None):
+        """
+        Hold this bank's write locks (for sessions in this process, then for other
+        processes) with the in-memory state caught up, and publish the result after.
+        With a label (and a history), the rows and taxonomy the transaction changed are
+        recorded as one undo step.
+        """
+        with self.lock, self.storage.lock:
+            # Nested transactions (e.g. a save inside an edit) join the outer one
+            outermost = not self._in_transaction
+            if not outermost:
+                yield
+                return
+            self._in_transaction = True
+            try:
+                self.refresh()
+                if label is None or self.history is None:
+                    yield
+                else:
+                    with self._recording(label):
+                        yield
+                self.version = self.storage.version()
+                self.publish_state()
+                if self.backups is not None and self.backups.due(self.version):
+                    self.backup()
+            finally:
+                self._in_transaction = False
+
+    @contextmanager
+    def _recording(self, label):
+        # Record the enclosed changes as an undo step, unless the table was replaced
+        table, taxonomy = self.table, self._taxonomy()
+        with table.recording() as changes:
+            yield
+        if table is not self.table:
+            return
+        after = table.row_images(list(changes))
+        rows = {
+            problem_id: (before, after[problem_id])
+            for problem_id, before in changes.items()
+            if _image_version(before) != _image_version(after[problem_id])
+        }
+        changed = self._taxonomy()
+        if changed == taxonomy:
+            self.history.record(label, rows)
+        else:
+            self.history.record(label, rows, (taxonomy, changed))
+
+    def _taxonomy(self):
+        # A copy of the categories and subcategories, safe from later in-place edits
+        return list(self.categories), {
+            category: list(subs) for category, subs in self.subcategories.items()
+        }
+
+    def refresh(self):
+        """
+        Reload the state if the storage was written since it was loaded.
+        Another session in this process has usually published the new state already;
+        only writes from other processes need a read from disk.
+        """
+        version = self.storage.version()
+        if version == self.version:
+            return
+        self.categories, self.subcategories = self.load_categories_and_subcategories()
+        self.table = self.load_database()
+        if self.version != version:
+            self.categories, self.subcategories = self.read_categories_and_subcategories()
+            self.version, self.table = self.read_database()
+            self.publish_state()
+
+    @traced(measure=_problem_io)
+    def save_database(self):
+        """
+        Save the current DataFrame to the storage backend, replacing what is there.
+        The whole table is rewritten anyway, so tombstoned rows are compacted away first.
+        """
+        with self.transaction():
+            self.table.compact()
+            self.storage.write_problems(self.df)
+
+    def compact_storage(self):
+        """
+        Fold the journal back into the base files, on the background writer if there is
+        one, where a newer compaction of this storage replaces a queued one. The changes
+        are already durable in the journal, so a compaction that another process's
+        rewrite has overtaken is simply dropped.
+        """
+        self.table.compact()
+        # Taken before the snapshot: journal records up to here are in the snapshot
+        checkpoint = self.storage.checkpoint()
+        if self.writer is None:
+            self.storage.write_problems(self.df, checkpoint)
+            return
+        snapshot = self.df.copy()
+
+        def write():
+            with self.lock, self.storage.lock:
+                before = self.storage.version()
+                self.storage.write_problems(snapshot, checkpoint)
+                # Only claim the new version if nobody else wrote in the meantime
+                if self.version == before:
+                    self.version = self.storage.version()
+                    self.publish_state()
+
+        self.writer.submit(("problems", self.storage.key), write)
+
+    def backup(self, reason="auto"):
+        """
+        Snapshot the bank into the backup store and prune old snapshots. Automatic
+        snapshots go through the background writer if there is one; a newer queued
+        snapshot replaces an older one, and the writer renders the state it was given.
+        Returns the manifest when the snapshot is taken right away.
+        """
+        self._check_backups()
+        with self.transaction():
+            if self.writer is None or reason != "auto":
+                files = _backup_files(self.df, self.categories_frame())
+                manifest = self.backups.snapshot(files, self.version, reason)
+                self.backups.prune()
+                return manifest
+            df, categories = self.df.copy(), self.categories_frame()
+            version = self.version
+
+        def write():
+            files = _backup_files(df, categories)
+            with self.lock, self.storage.lock:
+                self.backups.snapshot(files, version, reason)
+                self.backups.prune()
+
+        self.writer.submit(("backup", self.storage.key), write)
+        return None
+
+    def restore_backup(self, snapshot_id):
+        """
+        Replace the bank's problems and categories with a snapshot. The current state
+        is snapshotted first, so a restore can itself be undone by restoring that.
+        """
+        self._check_backups()
+        with self.transaction():
+            problems, categories = self.backups.frames(snapshot_id)
+            self.backup(reason=f"before restoring {snapshot_id}")
+            self.storage.write_categories(categories)
+            STATE_CACHE.invalidate(("taxonomy", self.storage.key))
+            self.categories, self.subcategories = self.read_categories_and_subcategories()
+            self.table = ProblemTable(problems, self.tag_vocabulary())
+            self.storage.write_problems(self.df)
+
+    def diff_backups(self, old_id, new_id):
+        """
+        The problems and category pairs that differ between two snapshots.
+        """
+        self._check_backups()
+        return self.backups.diff(old_id, new_id)
+
+    def _check_backups(self):
+        if self.backups is None:
+            raise ValueError("Backups are not enabled for this bank!")
+
+    def undo(self):
+        """
+        Revert this session's latest undoable change and make it available to redo.
+        Raises ConflictError if a problem or the taxonomy it touched has been changed
+        since by someone else.
+        """
+        self._replay("undo", self.history.undo_steps, self.history.redo_steps)
+
+    def redo(self):
+        """
+        Reapply the change undo() last reverted.
+        """
+        self._replay("redo", self.history.redo_steps, self.history.undo_steps)
+
+    def _replay(self, action, source, target):
+        if self.history is None or not source:
+            raise ValueError(f"Nothing to {action}!")
+        step = source[-1]
+        # Undo goes from each after-image back to the before-image; redo the reverse
+        expected, wanted = (1, 0) if action == "undo" else (0, 1)
+        with self.transaction():
+            current = self.table.row_images(list(step["rows"]))
+            stale = [
+                f"problem {problem_id}"
+                for problem_id, images in step["rows"].items()
+                if _image_version(current[problem_id])
+                != _image_version(images[expected])
+            ]
+            taxonomy = step["taxonomy"]
+            if taxonomy is not None and self._taxonomy() != taxonomy[expected]:
+                stale.append("the taxonomy")
+            if stale:
+                changed = stale[0]
+                raise ConflictError(
+                    f"Cannot {action} \"{step['label']}\": {changed} was changed by "
+                    "someone else since."
+                )
+            if taxonomy is not None:
+                categories, subcategories = taxonomy[wanted]
+                self.categories = list(categories)
+                self.subcategories = {
+                    category: list(subs) for category, subs in subcategories.items()
+                }
+                self.save_categories()
+            self._write_images(
+                {problem_id: pair[wanted] for problem_id, pair in step["rows"].items()}
+            )
+        source.pop()
+        target.append(step)
+
+    def _write_images(self, images):
+        # Bring each problem to its image (None deletes it) and persist the result.
+        # An ID with several rows, in its image or in the table, is restored row by
+        # row; the journal keeps one row per ID, so that saves the whole database
+        restores = {
+            problem_id: image
+            for problem_id, image in images.items()
+            if isinstance(image, tuple) or problem_id in self.table.duplicates
+        }
+        if restores:
+            for problem_id, image in restores.items():
+                rows = [image] if isinstance(image, dict) else list(image or ())
+                self.table.restore(problem_id, rows)
+            images = {i: image for i, image in images.items() if i not in restores}
+            self._write_rows(images)
+            self.save_database()
+            return
+        if len(images) == 1:
+            problem_id, row = next(iter(images.items()))
+            op = "update" if problem_id in self.table else "add"
+            op = "delete" if row is None else op
+            self._write_rows(images)
+            self.record_change(op, problem_id, row)
+            return
+        self._write_rows(images)
+        if images:
+            self.save_database()
+
+    def _write_rows(self, images):
+        # Bring each problem (one row per ID) to its image, in the table only
+        rows = [row for row in images.values() if row is not None]
+        updates = [row for row in rows if row["Custom_Problem_ID"] in self.table]
+        adds = [row for row in rows if row["Custom_Problem_ID"] not in self.table]
+        deletes = [i for i, row in images.items() if row is None and i in self.table]
+        if updates:
+            self.table.update_many(pd.DataFrame(updates))
+        if adds:
+            self.table.extend(pd.DataFrame(adds))
+        for problem_id in deletes:
+            self.table.delete(problem_id)
+
+    def flush(self):
+        """
+        Wait until every queued background write has reached disk.
+        """
+        if self.writer is not None:
+            self.writer.flush()
+
+    def record_change(self, op, problem_id, row=None):
+        """
+        Persist a single add/update/delete.
+        Backends that can store it incrementally (journal, SQLite) do so, compacting the
+        journal when it is due; otherwise the whole database is saved.
+        """
+        if not self.storage.write_change(op, problem_id, row):
+            self.save_database()
+        elif self.storage.compaction_due():
+            self.compact_storage()
+
+    def add_custom_category(self, custom_category, custom_subcategory):
+        """
+        Add a new custom category and its subcategory if provided.
+        """
+        with self.transaction(f"Add category {custom_category}"):
+            if custom_category in self.categories:
+                raise ValueError("Category already exists!")
+            self.categories.append(custom_category)
+            self.subcategories[custom_category] = (
+                [custom_subcategory] if custom_subcategory else []
+            )
+            self.save_categories()  # Save categories to CSV after modification
+
+    def update_custom_category(self, old_category, new_category, new_subcategories):
+        """
+        Update an existing custom category and its subcategories.
+        """
+        with self.transaction(f"Update category {old_category}"):
+            if old_category not in self.categories:
+                raise ValueError("Category does not exist!")
+
+            new_subcategories_list = [
+                sub.strip() for sub in new_subcategories.split(",") if sub.strip()
+            ]
+
+            # Renaming onto an existing category merges the two
+            renaming = new_category != old_category
+            merging = renaming and new_category in self.categories
+            if renaming:
+                self._rename_category(old_category, new_category)
+            if merging:
+                new_subcategories_list = list(
+                    dict.fromkeys(self.subcategories[new_category] + new_subcategories_list)
+                )
+            # Subcategories left out of the list are removed from the problems too
+            removed = {
+                sub: None
+                for sub in self.subcategories[new_category]
+                if sub not in new_subcategories_list
+            }
+            if removed:
+                self._retag_subcategories(new_category, removed)
+            self.subcategories[new_category] = new_subcategories_list
+
+            # One write of each file, whatever combination of changes was made
+            if renaming or removed:
+                self.save_taxonomy()
+            else:
+                self.save_categories()  # Save categories to CSV after modification
+
+    @traced(measure=_category_io)
+    def save_categories(self):
+        """
+        Save the current categories and subcategories to the categories.csv file.
+        """
+        self.storage.write_categories(self.categories_frame())
+        # The lists were edited in place, so the taxonomy is rebuilt on next use
+        STATE_CACHE.invalidate(("taxonomy", self.storage.key))
+
+    def categories_frame(self):
+        """
+        The (Category, Subcategory) pairs as a DataFrame, in file order.
+        """
+        rows = []
+        for category, subs in self.subcategories.items():
+            for sub in subs:
+                rows.append([category, sub])
+        return pd.DataFrame(rows, columns=["Category", "Subcategory"])
+
+    def rename_category(self, old_category, new_category):
+        """
+        Rename a category everywhere, including every problem tagged with it.
+        Renaming onto an existing category merges the two.
+        """
+        with self.transaction(f"Rename category {old_category}"):
+            self._rename_category(old_category, new_category)
+            self.save_taxonomy()
+
+    def _rename_category(self, old_category, new_category):
+        # rename_category() without saving, for callers that save once at the end
+        if new_category in self.categories and new_category != old_category:
+            self._merge_categories([old_category], new_category)
+            return
+        self._check_category(old_category)
+        if not new_category:
+            raise ValueError("Category name cannot be empty!")
+        self.categories = [
+            new_category if category == old_category else category
+            for category in self.categories
+        ]
+        self.subcategories = {
+            new_category if category == old_category else category: subs
+            for category, subs in self.subcategories.items()
+        }
+        self._retag_categories({old_category: new_category})
+
+    def merge_categories(self, source_categories, target_category):
+        """
+        Fold the source categories (and their subcategories) into the target category,
+        retagging every affected problem.
+        """
+        with self.transaction(f"Merge into category {target_category}"):
+            self._merge_categories(source_categories, target_category)
+            self.save_taxonomy()
+
+    def _merge_categories(self, source_categories, target_category):
+        # merge_categories() without saving
+        self._check_category(target_category)
+        sources = [c for c in source_categories if c != target_category]
+        for category in sources:
+            self._check_category(category)
+        for category in sources:
+            self.subcategories[target_category] = list(
+                dict.fromkeys(
+                    self.subcategories[target_category]
+                    + self.subcategories.pop(category)
+                )
+            )
+        self.categories = [c for c in self.categories if c not in sources]
+        self._retag_categories({category: target_category for category in sources})
+
+    def delete_category(self, category):
+        """
+        Delete a category and its subcategories, removing those tags from every problem.
+        """
+        with self.transaction(f"Delete category {category}"):
+            self._check_category(category)
+            # Subcategory tags are matched through their category, so drop them first
+            self._retag_subcategories(
+                category, {sub: None for sub in self.subcategories[category]}
+            )
+            self.categories = [c for c in self.categories if c != category]
+            del self.subcategories[category]
+            self._retag_categories({category: None})
+            self.save_taxonomy()
+
+    def rename_subcategory(self, category, old_subcategory, new_subcategory):
+        """
+        Rename a subcategory of a category, including on every problem tagged with it.
+        Renaming onto an existing subcategory of the same category merges the two.
+        """
+        with self.transaction(f"Rename subcategory {old_subcategory}"):
+            subs = self._check_subcategory(category, old_subcategory)
+            if new_subcategory in subs and new_subcategory != old_subcategory:
+                self.merge_subcategories(category, [old_subcategory], new_subcategory)
+                return
+            if not new_subcategory:
+                raise ValueError("Subcategory name cannot be empty!")
+            self.subcategories[category] = [
+                new_subcategory if sub == old_subcategory else sub for sub in subs
+            ]
+            self._retag_subcategories(category, {old_subcategory: new_subcategory})
+            self.save_taxonomy()
+
+    def merge_subcategories(self, category, source_subcategories, target_subcategory):
+        """
+        Fold subcategories of a category into another of its subcategories.
+        """
+        with self.transaction(f"Merge into subcategory {target_subcategory}"):
+            self._check_subcategory(category, target_subcategory)
+            sources = [s for s in source_subcategories if s != target_subcategory]
+            for sub in sources:
+                self._check_subcategory(category, sub)
+            self.subcategories[category] = [
+                sub for sub in self.subcategories[category] if sub not in sources
+            ]
+            self._retag_subcategories(
+                category, {sub: target_subcategory for sub in sources}
+            )
+            self.save_taxonomy()
+
+    def delete_subcategory(self, category, subcategory):
+        """
+        Delete a subcategory of a category, removing it from every problem tagged with it.
+        """
+        with self.transaction(f"Delete subcategory {subcategory}"):
+            self._check_subcategory(category, subcategory)
+            self.subcategories[category] = [
+                sub for sub in self.subcategories[category] if sub != subcategory
+            ]
+            self._retag_subcategories(category, {subcategory: None})
+            self.save_taxonomy()
+
+    def _check_category(self, category):
+        if category not in self.categories:
+            raise ValueError("Category does not exist!")
+
+    def _check_subcategory(self, category, subcategory):
+        self._check_category(category)
+        subs = self.subcategories[category]
+        if subcategory not in subs:
+            raise ValueError("Subcategory does not exist!")
+        return subs
+
+    def _retag_categories(self, mapping):
+        # Category names are unique, so every problem carrying one is affected
+        for field in ("Category", "Focus_Category"):
+            self.table.rewrite_tags(field, mapping)
+
+    def _retag_subcategories(self, category, mapping):
+        # A subcategory name can appear under several categories; where it does, only
+        # problems that also carry this category (in the matching field) are retagged
+        other_subs = {
+            sub
+            for other, subs in self.subcategories.items()
+            if other != category
+            for sub in subs
+        }
+        shared = {old: new for old, new in mapping.items() if old in other_subs}
+        unique = {old: new for old, new in mapping.items() if old not in other_subs}
+        for field, category_field in (
+            ("Subcategory", "Category"),
+            ("Focus_Subcategory", "Focus_Category"),
+        ):
+            if unique:
+                self.table.rewrite_tags(field, unique)
+            if shared:
+                self.table.rewrite_tags(field, shared, within=(category_field, category))
+
+    def save_taxonomy(self):
+        """
+        Persist a taxonomy change: the categories file and the retagged problems, once each.
+        """
+        self.save_categories()
+        self.save_database()
+
+    def add_problem(
+        self, problem_id, category, subcategory, year, focus_category, focus_subcategory
+    ):
+        """
+        Add a new problem to the database.
+        """
+        with self.transaction(f"Add problem {problem_id}"):
+            if not problem_id:
+                raise ValueError("Problem ID cannot be empty!")
+            if problem_id in self.table:
+                raise ValueError("Problem ID already exists!")
+
+            new_data = {
+                "Custom_Problem_ID": problem_id,
+                "Category": join_tags(category),
+                "Subcategory": join_tags(subcategory),
+                "Year": year,
+                "Focus_Category": join_tags(focus_category),
+                "Focus_Subcategory": join_tags(focus_subcategory),
+            }
+            self.table.append(new_data)
+            self.record_change("add", problem_id, new_data)
+
+    def import_problems(self, source, name=None):
+        """
+        Import a CSV or JSONL file of problems in one pass.
+        Every row is validated up front; valid rows are appended in one operation and
+        persisted with a single write, invalid ones are reported and skipped.
+        Returns the number of imported problems and a DataFrame of per-row errors.
+        """
+        with self.transaction("Import problems"):
+            df = read_problem_file(source, name)
+            valid, errors = validate_problems(
+                df, self.categories, self.subcategories, self.table.index
+            )
+            if len(valid) > 0:
+                self.table.extend(valid)
+                self.save_database()
+            return len(valid), errors
+
+    def get_current_values(self, position):
+        """
+        Helper function to extract the current tag lists of the problem at a row position.
+        These are decoded from the tag bitsets, in the order the problem stores them.
+        """
+        return self.table.row_tags(position)
+
+    def row_version(self, problem_id):
+        """
+        Return the version of a problem to pass back as expected_version when editing it.
+        """
+        return self.table.version(problem_id)
+
+    def check_version(self, problem_id, expected_version):
+        # Compare-and-swap: the caller's edit must be based on the current row
+        if problem_id not in self.table:
+            raise ValueError("Problem does not exist!")
+        if expected_version is not None and expected_version != self.row_version(
+            problem_id
+        ):
+            raise ConflictError(
+                f"Problem {problem_id} was changed by someone else after you opened it. "
+                "Review its current values and try again."
+            )
+
+    def save_changes(
+        self,
+        problem_id,
+        category,
+        subcategory,
+        year,
+        focus_category,
+        focus_subcategory,
+        expected_version=None,
+    ):
+        """
+        Save the changes made to an existing problem.
+        With expected_version (from row_version), the save is refused if the problem changed since.
+        """
+        with self.transaction(f"Edit problem {problem_id}"):
+            self.check_version(problem_id, expected_version)
+
+            new_data = {
+                "Custom_Problem_ID": problem_id,
+                "Category": join_tags(category),
+                "Subcategory": join_tags(subcategory),
+                "Year": year,
+                "Focus_Category": join_tags(focus_category),
+                "Focus_Subcategory": join_tags(focus_subcategory),
+            }
+            self.table.update(problem_id, new_data)
+            self.record_change("update", problem_id, new_data)
+
+    def delete_problem(self, problem_id, expected_version=None):
+        """
+        Delete the selected problem from the database.
+        With expected_version (from row_version), the delete is refused if the problem changed since.
+        """
+        with self.transaction(f"Delete problem {problem_id}"):
+            self.check_version(problem_id, expected_version)
+            self.table.delete(problem_id)
+            self.record_change("delete", problem_id)
+
+    def select_problems(self, tag_filters=None, years=None, id_pattern=None):
+        """
+        Return the problems carrying every tag in tag_filters, with a Year in the
+        inclusive range years and an ID matching id_pattern (e.g. "2015_*").
+        """
+        return select_rows(self.find_problems(tag_filters or {}), years, id_pattern)
+
+    def plan_bulk_edit(self, problem_ids, operations):
+        """
+        Work out a bulk edit without applying it. operations is a list of
+        (name, field, value) from bulk.BULK_OPERATIONS, e.g. ("add_tags", "Category",
+        ["Kinetics"]) or ("set_year", "Year", 2024). Returns the new rows of the
+        problems that would change and the changed cells, for a preview.
+        """
+        check_operations(operations, self.categories, self.subcategories)
+        before = self.table.rows(problem_ids)
+        if len(before) == 0:
+            raise ValueError("No problems are selected!")
+        after = apply_operations(before, operations)
+        diff = edit_diff(before, after)
+        changed = after[after["Custom_Problem_ID"].isin(diff["Custom_Problem_ID"])]
+        return changed, diff
+
+    def bulk_edit(self, problem_ids, operations, expected_versions=None):
+        """
+        Apply operations to the given problems as one update of the table and one
+        write, undoable as a single step. With expected_versions ({problem ID:
+        row_version}, e.g. taken when the preview was shown) nothing is changed if any
+        of those problems changed since. Returns the changed cells.
+        """
+        with self.transaction(f"Bulk edit of {len(problem_ids)} problem(s)"):
+            for problem_id, version in (expected_versions or {}).items():
+                self.check_version(problem_id, version)
+            changed, diff = self.plan_bulk_edit(problem_ids, operations)
+            if len(changed) > 0:
+                self._write_images(
+                    dict(zip(changed["Custom_Problem_ID"], changed.to_dict("records")))
+                )
+            return diff
+
+    def find_problems(self, tag_filters):
+        """
+        Return the problems carrying every tag in tag_filters ({field: [tags]}).
+        Matches come from the tag -> problem ID index; with no tags selected all problems are returned.
+        """
+        matches = None
+        for field, tags in tag_filters.items():
+            if tags:
+                ids = self.table.postings.query(field, all_of=tags)
+                matches = ids if matches is None else matches & ids
+
+        if matches is None:
+            return self.df
+        return self.table.rows(matches)
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Return up to limit ("problem", id) and ("tag", name) matches for a typeahead query,
+        best first (exact, prefix, substring, then typo-tolerant).
+        """
+        return self.table.search.search(query, limit)
+
+    def search_problem_ids(self, query, limit=DEFAULT_LIMIT):
+        """
+        Return up to limit problem IDs for a query: matching IDs first, then the
+        problems carrying matching tags.
+        """
+        ids = []
+        for kind, text in self.search(query, limit):
+            if kind == "problem":
+                ids.append(text)
+            else:
+                tagged = set().union(
+                    *(self.table.postings.lookup(field, text) for field in TAG_FIELDS)
+                )
+                ids.extend(sorted(tagged))
+        return list(dict.fromkeys(ids))[:limit]
+
+    def sort_and_page(self, df, sort_column, descending, page, page_size):
+        """
+        Return rows (page - 1) * page_size onwards of df ordered by sort_column.
+        Only the sort keys are ordered (argsort); the frame itself is sliced, not copied.
+        """
+        if sort_column is None:
+            order = np.arange(len(df))
+        else:
+            order = np.argsort(df[sort_column].to_numpy(), kind="stable")
+        if descending:
+            order = order[::-1]
+        start = (page - 1) * page_size
+        return df.iloc[order[start : start + page_size]]
+
+    def stats(self):
+        """
+        Return problem, category and subcategory counts plus problems per year and per tag.
+        """
+        return {
+            "problems": len(self.table),
+            "categories": len(self.categories),
+            "subcategories": sum(len(subs) for subs in self.subcategories.values()),
+            "per_year": {
+                int(year): int(count)
+                for year, count in self.table.stats.year_counts().items()
+            },
+            "per_tag": {
+                field: {
+                    tag: len(self.table.postings.lookup(field, tag))
+                    for tag in self.table.postings.tags(field)
+                }
+                for field in TAG_FIELDS
+            },
+        }
+
+    def check_integrity(self):
+        """
+        Return the problems that break the bank's rules, one row per issue: tags missing
+        from the categories file, focus tags not among the problem's main tags, and
+        malformed or duplicate IDs. After the first call only changed rows are rechecked.
+        """
+        return self.table.issues(self.taxonomy)
+
+    def memory_report(self):
+        """
+        Return the bytes held per column of the problem table and its tag bitsets,
+        with a Total row.
+        """
+        report = self.table.memory_report()
+        total = pd.DataFrame(
+            [{"Column": "Total", "Dtype": "", "Bytes": report["Bytes"].sum()}]
+        )
+        return pd.concat([report, total], ignore_index=True)
+
+    def coverage(self, focus=False):
+        """
+        Problems per (category, subcategory) of the taxonomy, least covered first.
+        Read from the incrementally maintained co-occurrence counts, so pairs with no
+        problems are included and nothing is recomputed.
+        """
+        pair = ("Focus_Category", "Focus_Subcategory") if focus else CO_OCCURRENCE_PAIRS[0]
+        subcategories = list(
+            dict.fromkeys(sub for subs in self.subcategories.values() for sub in subs)
+        )
+        matrix = self.table.stats.co_occurrence(
+            pair, rows=self.categories, columns=subcategories
+        )
+        rows = [
+            (category, sub, int(matrix.at[category, sub]))
+            for category in self.categories
+            for sub in self.subcategories.get(category, [])
+        ]
+        df = pd.DataFrame(rows, columns=["Category", "Subcategory", "Problems"])
+        return df.sort_values("Problems", kind="stable", ignore_index=True)
@@ -0,0 +1,298 @@
+import html
+import io
+import json
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+from storage import PROBLEM_COLUMNS
+from tags import TAG_FIELDS, split_tags
+
+# Rows rendered per chunk; each chunk is encoded and handed on before the next
+EXPORT_CHUNK_ROWS = 2000
+# Format -> (label, file extension, MIME type)
+EXPORT_FORMATS = {
+    "jsonl": ("JSON Lines", "jsonl", "application/jsonl"),
+    "xlsx": (
+        "Excel",
+        "xlsx",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ),
+    "md": ("Practice sheet (Markdown)", "md", "text/markdown"),
+    "html": ("Practice sheet (HTML, printable)", "html", "text/html"),
+}
+# Headings for problems without a category or a year on the practice sheets
+NO_CATEGORY = "Uncategorized"
+NO_YEAR = "Unknown year"
+
+
+def row_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Yield df in slices of chunk_rows rows; slices are views, not copies.
+    """
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start : start + chunk_rows]
+
+
+def _text(values):
+    # Cell values as strings, missing ones as ""
+    values = values.astype(object)
+    return values.where(values.notna(), "").astype(str).tolist()
+
+
+def _years(values):
+    # Years as ints, missing ones (imported or legacy rows) as None
+    return [None if pd.isna(year) else int(year) for year in values.tolist()]
+
+
+def jsonl_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    One JSON object per problem and line, tags as lists (the form import accepts) and
+    a missing year as null.
+    """
+    for chunk in row_chunks(df, chunk_rows):
+        columns = {column: _text(chunk[column]) for column in TAG_FIELDS}
+        ids = _text(chunk["Custom_Problem_ID"])
+        years = _years(chunk["Year"])
+        lines = []
+        for i, problem_id in enumerate(ids):
+            record = {"Custom_Problem_ID": problem_id, "Year": years[i]}
+            for field in TAG_FIELDS:
+                record[field] = split_tags(columns[field][i])
+            lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+        yield "".join(lines).encode("utf-8")
+
+
+def _column_letter(index):
+    # 0 -> A, 25 -> Z, 26 -> AA
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" '
+        'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'relationships"><Relationship Id="rId1" Type="http://schemas.openxmlformats'
+        '.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/></Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Problems" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'relationships"><Relationship Id="rId1" Type="http://schemas.openxmlformats'
+        '.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/></Relationships>'
+    ),
+}
+
+
+class _Pipe(io.RawIOBase):
+    # Write-only stream whose contents are taken out as they arrive
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _xlsx_row(number, values):
+    cells = []
+    for column, value in enumerate(values):
+        ref = f"{_column_letter(column)}{number}"
+        if isinstance(value, (int, np.integer)):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        elif value is not None and value != "":
+            cells.append(
+                f'<c r="{ref}" t="inlineStr"><is><t>{escape(value)}</t></is></c>'
+            )
+    return f'<row r="{number}">{"".join(cells)}</row>'
+
+
+def xlsx_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    An Excel workbook with one sheet of the problems. The sheet XML is written row
+    chunk by row chunk into a streamed zip (no spreadsheet library is needed), and
+    the compressed bytes are yielded as they are produced.
+    """
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, "w", zipfile.ZIP_DEFLATED) as workbook:
+        for name, text in XLSX_PARTS.items():
+            workbook.writestr(name, text)
+        yield pipe.drain()
+        with workbook.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                (
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                    '<worksheet xmlns="http://schemas.openxmlformats.org/'
+                    'spreadsheetml/2006/main"><sheetData>'
+                    + _xlsx_row(1, PROBLEM_COLUMNS)
+                ).encode("utf-8")
+            )
+            number = 1
+            for chunk in row_chunks(df, chunk_rows):
+                columns = {
+                    column: _years(chunk[column])
+                    if column == "Year"
+                    else _text(chunk[column])
+                    for column in PROBLEM_COLUMNS
+                }
+                rows = []
+                for i in range(len(chunk)):
+                    number += 1
+                    values = [columns[column][i] for column in PROBLEM_COLUMNS]
+                    rows.append(_xlsx_row(number, values))
+                sheet.write("".join(rows).encode("utf-8"))
+                yield pipe.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield pipe.drain()
+
+
+def sheet_order(df):
+    """
+    The row positions of df in practice sheet order (by first category, then year,
+    then ID), with the category heading of each. Only the sort keys are built; the
+    rows are taken in chunks afterwards.
+    """
+    categories = pd.Series(_text(df["Category"]), index=df.index)
+    first = categories.str.split(", ", n=1).str[0].replace("", NO_CATEGORY)
+    keys = pd.DataFrame(
+        {
+            "Category": first.to_numpy(),
+            "Year": df["Year"].to_numpy(),
+            "Custom_Problem_ID": _text(df["Custom_Problem_ID"]),
+        }
+    )
+    order = keys.sort_values(list(keys.columns), kind="stable").index.to_numpy()
+    return order, first.to_numpy()[order]
+
+
+def _sheet_groups(df, chunk_rows):
+    # Yield (chunk, its category headings, its year headings, problem details) for
+    # the practice sheets; missing years sort last, under NO_YEAR
+    order, headings = sheet_order(df)
+    for start in range(0, len(order), chunk_rows):
+        chunk = df.iloc[order[start : start + chunk_rows]]
+        years = [
+            NO_YEAR if year is None else str(year) for year in _years(chunk["Year"])
+        ]
+        details = {field: _text(chunk[field]) for field in TAG_FIELDS}
+        yield chunk, headings[start : start + chunk_rows], years, details
+
+
+def markdown_chunks(df, title="Practice problems", chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    A Markdown practice sheet: a section per category (a problem's first one) and a
+    subsection per year, listing each problem with its subcategories and focus.
+    """
+    yield f"# {title}\n\n{len(df)} problem(s)\n".encode("utf-8")
+    category = year = None
+    for chunk, headings, years, details in _sheet_groups(df, chunk_rows):
+        lines = []
+        for i, problem_id in enumerate(_text(chunk["Custom_Problem_ID"])):
+            if headings[i] != category:
+                category, year = headings[i], None
+                lines.append(f"\n## {category}\n")
+            if years[i] != year:
+                year = years[i]
+                lines.append(f"\n### {year}\n\n")
+            line = f"- [ ] **{problem_id}**"
+            if details["Subcategory"][i]:
+                line += f": {details['Subcategory'][i]}"
+            focus = details["Focus_Subcategory"][i] or details["Focus_Category"][i]
+            if focus:
+                line += f" (focus: {focus})"
+            lines.append(line + "\n")
+        yield "".join(lines).encode("utf-8")
+
+
+SHEET_STYLE = (
+    "body{font-family:sans-serif;max-width:50em;margin:auto}"
+    "h2{border-bottom:1px solid #999;margin-top:2em}"
+    "h2{break-before:page}h2:first-of-type{break-before:auto}"
+    "li{margin:.3em 0}.focus{color:#555}"
+)
+
+
+def html_chunks(df, title="Practice problems", chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    The practice sheet as a standalone HTML page; each category starts a new printed
+    page.
+    """
+    yield (
+        f"<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>{html.escape(title)}</title><style>{SHEET_STYLE}</style></head>"
+        f"<body><h1>{html.escape(title)}</h1><p>{len(df)} problem(s)</p>\n"
+    ).encode("utf-8")
+    category = year = None
+    for chunk, headings, years, details in _sheet_groups(df, chunk_rows):
+        parts = []
+        for i, problem_id in enumerate(_text(chunk["Custom_Problem_ID"])):
+            if headings[i] != category:
+                if category is not None:
+                    parts.append("</ul>\n")
+                category, year = headings[i], None
+                parts.append(f"<h2>{html.escape(category)}</h2>\n")
+            if years[i] != year:
+                if year is not None:
+                    parts.append("</ul>\n")
+                year = years[i]
+                parts.append(f"<h3>{html.escape(year)}</h3>\n<ul>\n")
+            item = f"<li>&#9744; <b>{html.escape(problem_id)}</b>"
+            if details["Subcategory"][i]:
+                item += f": {html.escape(details['Subcategory'][i])}"
+            focus = details["Focus_Subcategory"][i] or details["Focus_Category"][i]
+            if focus:
+                item += f" <span class='focus'>(focus: {html.escape(focus)})</span>"
+            parts.append(item + "</li>\n")
+        yield "".join(parts).encode("utf-8")
+    yield ("</ul>\n" if len(df) else "").encode("utf-8") + b"</body></html>\n"
+
+
+def export_chunks(df, fmt, title="Practice problems", chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Yield the export of df in the given format (a key of EXPORT_FORMATS) as bytes,
+    chunk by chunk, so memory stays flat however many problems are exported.
+    """
+    if fmt == "jsonl":
+        return jsonl_chunks(df, chunk_rows)
+    if fmt == "xlsx":
+        return xlsx_chunks(df, chunk_rows)
+    if fmt == "md":
+        return markdown_chunks(df, title, chunk_rows)
+    if fmt == "html":
+        return html_chunks(df, title, chunk_rows)
+    raise ValueError(f"Unknown export format {fmt!r}!")
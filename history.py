@@ -0,0 +1,53 @@
+from collections import deque
+
+# Undo steps kept per session; the oldest are dropped beyond this
+UNDO_DEPTH = 50
+
+
+class UndoHistory:
+    """
+    One session's undo and redo stacks.
+
+    A step holds only what its mutation changed: the before and after image of each
+    problem row it touched (None where the row did not exist) and, if the taxonomy
+    changed, the categories before and after. Unchanged rows are never copied; they
+    stay shared with the live table, so a step costs memory in proportion to the rows
+    it changed. Recording a new step clears the redo stack.
+    """
+
+    def __init__(self, depth=UNDO_DEPTH):
+        self.depth = depth
+        self.undo_steps = deque(maxlen=depth)
+        self.redo_steps = []
+
+    def record(self, label, rows, taxonomy=None):
+        """
+        Push a step: rows is {problem ID: (before, after)} and taxonomy, if given,
+        is (before, after) with each a (categories, subcategories) pair.
+        """
+        if not rows and taxonomy is None:
+            return
+        self.undo_steps.append({"label": label, "rows": rows, "taxonomy": taxonomy})
+        self.redo_steps.clear()
+
+    def can_undo(self):
+        return bool(self.undo_steps)
+
+    def can_redo(self):
+        return bool(self.redo_steps)
+
+    def next_undo(self):
+        """
+        Label of the step undo would revert, or None.
+        """
+        return self.undo_steps[-1]["label"] if self.undo_steps else None
+
+    def next_redo(self):
+        """
+        Label of the step redo would reapply, or None.
+        """
+        return self.redo_steps[-1]["label"] if self.redo_steps else None
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps.clear()
@@ -0,0 +1,101 @@
+import os
+
+import pandas as pd
+
+from storage import PROBLEM_COLUMNS
+from tags import TAG_FIELDS, TAG_SEPARATOR
+
+# YYYY_PXX: year, then P and the two-digit problem number (e.g. 2008_P01)
+PROBLEM_ID_PATTERN = r"\d{4}_P\d{2}"
+YEAR_RANGE = (1900, 2100)
+
+
+def read_problem_file(source, name=None):
+    """
+    Read a CSV or JSONL file of problems (a path or an uploaded file object).
+    The format is taken from the file name's extension.
+    """
+    name = name or getattr(source, "name", source)
+    if os.path.splitext(str(name))[1].lower() in (".jsonl", ".ndjson"):
+        df = pd.read_json(source, lines=True, dtype=False)
+    else:
+        df = pd.read_csv(source, dtype=str, keep_default_na=False)
+
+    # Tag columns may hold lists in JSONL; store everything in the ", "-joined form
+    for column in TAG_FIELDS:
+        if column not in df.columns:
+            df[column] = ""
+        df[column] = df[column].map(
+            lambda value: TAG_SEPARATOR.join(value)
+            if isinstance(value, list)
+            else ("" if pd.isna(value) else str(value))
+        )
+    return df
+
+
+def known_tags(categories, subcategories):
+    """
+    The tags each tag field may hold: {field: set of names} from the categories file.
+    """
+    subs = {sub for category_subs in subcategories.values() for sub in category_subs}
+    return {
+        "Category": set(categories),
+        "Focus_Category": set(categories),
+        "Subcategory": subs,
+        "Focus_Subcategory": subs,
+    }
+
+
+def validate_problems(df, categories, subcategories, existing_ids):
+    """
+    Check a whole batch of new problems at once.
+    Returns (valid_rows, errors): the rows that passed, in PROBLEM_COLUMNS form, and a
+    DataFrame of Row (1-based line in the batch), Custom_Problem_ID and Error.
+    """
+    df = df.reset_index(drop=True)
+    errors = []
+
+    def flag(mask, message):
+        for row in mask[mask].index:
+            errors.append((row + 1, df.at[row, "Custom_Problem_ID"], message))
+
+    for column in PROBLEM_COLUMNS:
+        if column not in df.columns:
+            df[column] = ""
+    ids = df["Custom_Problem_ID"].fillna("").astype(str).str.strip()
+    df["Custom_Problem_ID"] = ids
+
+    flag(ids == "", "Missing Custom_Problem_ID")
+    flag(
+        (ids != "") & ~ids.str.fullmatch(PROBLEM_ID_PATTERN),
+        "Custom_Problem_ID is not in YYYY_PXX form",
+    )
+    flag((ids != "") & ids.duplicated(keep=False), "Duplicate ID within the file")
+    flag(ids.isin(set(existing_ids)), "ID already exists in the database")
+
+    years = pd.to_numeric(df["Year"], errors="coerce")
+    flag(
+        years.isna() | (years < YEAR_RANGE[0]) | (years > YEAR_RANGE[1]),
+        f"Year must be a number between {YEAR_RANGE[0]} and {YEAR_RANGE[1]}",
+    )
+
+    # Tags must exist in the categories file: explode once per field and test membership
+    known = known_tags(categories, subcategories)
+    for field in TAG_FIELDS:
+        exploded = df[field].str.split(TAG_SEPARATOR).explode()
+        unknown = exploded[(exploded != "") & ~exploded.isin(known[field])]
+        for row, tags in unknown.groupby(level=0):
+            errors.append(
+                (
+                    row + 1,
+                    df.at[row, "Custom_Problem_ID"],
+                    f"Unknown {field.replace('_', ' ')}: {', '.join(tags)}",
+                )
+            )
+
+    errors = pd.DataFrame(errors, columns=["Row", "Custom_Problem_ID", "Error"])
+    valid = df[~(df.index + 1).isin(errors["Row"])].copy()
+    valid["Year"] = years[valid.index].astype(int)
+    return valid[PROBLEM_COLUMNS].reset_index(drop=True), errors.sort_values(
+        "Row", kind="stable"
+    ).reset_index(drop=True)
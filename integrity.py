@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+
+from importer import PROBLEM_ID_PATTERN, known_tags
+from tags import TAG_FIELDS, TAG_SEPARATOR, WORD_BITS
+
+# One bit per kind of issue in a row's flags
+UNKNOWN_TAG = {field: 1 << bit for bit, field in enumerate(TAG_FIELDS)}
+FOCUS_OUTSIDE = {"Focus_Category": 1 << 4, "Focus_Subcategory": 1 << 5}
+MALFORMED_ID = 1 << 6
+DUPLICATE_ID = 1 << 7
+# Focus field -> the field its tags must also appear in
+FOCUS_OF = {"Focus_Category": "Category", "Focus_Subcategory": "Subcategory"}
+ISSUE_COLUMNS = ["Custom_Problem_ID", "Issue", "Field", "Tags"]
+
+
+class IntegrityIndex:
+    """
+    Per-row integrity flags over a TagMatrix, kept up to date as rows change.
+
+    A row is flagged for tags missing from the categories file, focus tags that are not
+    among its main tags, and an ID that is malformed or shared with another row. The
+    tag checks are bit operations on the rows' tag words: a tag is unknown if its bit
+    falls outside the mask of the taxonomy's tags, and a focus tag is out of place if
+    its bit is set in the focus field but not in the main one. Nothing is computed
+    until the first check, which covers the whole table; after that only the changed
+    rows are rechecked, unless the taxonomy starts allowing other tags.
+    """
+
+    def __init__(self, tags):
+        self.tags = tags
+        # uint8 flags per row position, or None until the first full check
+        self.flags = None
+        self.taxonomy = None
+        # field -> names the taxonomy allows there, and the same as tag words (bit set
+        # per allowed tag) for the vocabulary size they were built at
+        self._known_names = {}
+        self._known = {}
+        self._known_size = None
+
+    def set_taxonomy(self, taxonomy):
+        """
+        Check against this taxonomy from now on. Returns whether it allows other tags
+        than the previous one, in which case the caller must rebuild the flags.
+        """
+        self.taxonomy = taxonomy
+        known = known_tags(taxonomy.categories, taxonomy.subcategories)
+        if known == self._known_names:
+            return False
+        self._known_names = known
+        self._known_size = None
+        return True
+
+    def _known_words(self, field, width):
+        # The known-tag mask of a field, width words wide. Rebuilt when tags got new
+        # codes, since an allowed tag may have been coded since the last build
+        if self._known_size != len(self.tags.tags):
+            self._known_size = len(self.tags.tags)
+            n_words = max(1, -(-self._known_size // WORD_BITS))
+            for known_field, names in self._known_names.items():
+                codes = np.array(
+                    [self.tags.codes[tag] for tag in names if tag in self.tags.codes],
+                    dtype=np.int64,
+                )
+                words = np.zeros(n_words, dtype=np.uint64)
+                np.bitwise_or.at(
+                    words,
+                    codes // WORD_BITS,
+                    np.left_shift(np.uint64(1), (codes % WORD_BITS).astype(np.uint64)),
+                )
+                self._known[known_field] = words
+        known = self._known[field]
+        return np.pad(known, (0, max(0, width - len(known))))[:width]
+
+    def _offending(self, field, positions):
+        # Tag words of the rows at positions keeping only the bits that break a rule:
+        # (unknown tags, and for a focus field the tags missing from its main field)
+        words = self.tags.words[field][positions]
+        unknown = words & ~self._known_words(field, words.shape[1])
+        if field not in FOCUS_OF:
+            return unknown, None
+        return unknown, words & ~self.tags.words[FOCUS_OF[field]][positions]
+
+    def rebuild(self, ids, live):
+        """
+        Recompute the flags of every row (ids is the ID column, live the row flags).
+        """
+        self.flags = np.zeros(len(ids), dtype=np.uint8)
+        self.check(np.arange(len(ids)), ids)
+        live_ids = pd.Series(ids)[live]
+        duplicated = live_ids[live_ids.duplicated(keep=False)].index.to_numpy()
+        self.flags[duplicated] |= DUPLICATE_ID
+
+    def check(self, positions, ids):
+        """
+        Recompute the flags of the rows at positions, whose IDs are ids.
+        """
+        if self.flags is None:
+            return
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(self.flags) < self.tags.n_rows:
+            # Grown geometrically, so appends don't copy the flags each time
+            grown = np.zeros(max(self.tags.n_rows, 2 * len(self.flags)), dtype=np.uint8)
+            grown[: len(self.flags)] = self.flags
+            self.flags = grown
+        flags = self.flags[positions] & DUPLICATE_ID
+        for field in TAG_FIELDS:
+            unknown, outside = self._offending(field, positions)
+            flags[np.any(unknown != 0, axis=1)] |= UNKNOWN_TAG[field]
+            if outside is not None:
+                flags[np.any(outside != 0, axis=1)] |= FOCUS_OUTSIDE[field]
+        ids = pd.Series(np.asarray(ids, dtype=object)).astype(str)
+        flags[~ids.str.fullmatch(PROBLEM_ID_PATTERN).to_numpy()] |= MALFORMED_ID
+        self.flags[positions] = flags
+
+    def clear(self, positions):
+        """
+        Drop the flags of deleted rows.
+        """
+        if self.flags is not None:
+            self.flags[np.asarray(positions, dtype=np.int64)] = 0
+
+    def mark_duplicates(self, positions):
+        """
+        Flag rows added with an ID that other rows also have (after check() on them).
+        """
+        if self.flags is not None:
+            self.flags[np.asarray(positions, dtype=np.int64)] |= DUPLICATE_ID
+
+    def _decode(self, words):
+        # ", "-joined tag names of the bits set in each row of words
+        as_bytes = words.astype("<u8").view(np.uint8)
+        bits = np.unpackbits(as_bytes, axis=1, bitorder="little")
+        rows, codes = np.nonzero(bits)
+        names = [[] for _ in range(len(words))]
+        for row, code in zip(rows.tolist(), codes.tolist()):
+            names[row].append(self.tags.tags[code])
+        return [TAG_SEPARATOR.join(row_names) for row_names in names]
+
+    def report(self, ids, live):
+        """
+        The issues of the live rows (ids is the ID column), one row per (problem,
+        issue, field), as a DataFrame of Custom_Problem_ID, Issue, Field and Tags
+        (the offending tags). Costs time in proportion to the flagged rows.
+        """
+        flags = np.where(live, self.flags[: len(live)], 0)
+        parts = []
+
+        def add(bit, issue, field, which=None):
+            # which: 0 for unknown tags, 1 for focus tags missing from the main field
+            positions = np.flatnonzero(flags & bit)
+            if len(positions) == 0:
+                return
+            tags = ""
+            if which is not None:
+                tags = self._decode(self._offending(field, positions)[which])
+            parts.append(
+                pd.DataFrame(
+                    {
+                        "position": positions,
+                        "Custom_Problem_ID": ids.iloc[positions].to_numpy(),
+                        "Issue": issue,
+                        "Field": field,
+                        "Tags": tags,
+                    }
+                )
+            )
+
+        for field in TAG_FIELDS:
+            add(UNKNOWN_TAG[field], "Not in the categories file", field, 0)
+        for focus, main in FOCUS_OF.items():
+            add(FOCUS_OUTSIDE[focus], f"Focus tag not in {main}", focus, 1)
+        add(MALFORMED_ID, "ID is not in YYYY_PXX form", "Custom_Problem_ID")
+        add(DUPLICATE_ID, "ID used by several rows", "Custom_Problem_ID")
+        if not parts:
+            return pd.DataFrame(columns=ISSUE_COLUMNS)
+        issues = pd.concat(parts, ignore_index=True)
+        issues = issues.sort_values("position", kind="stable")
+        return issues[ISSUE_COLUMNS].reset_index(drop=True)
@@ -0,0 +1,208 @@
+import json
+import os
+import stat
+import tempfile
+import threading
+
+import pandas as pd
+
+# Read once at import: os.umask() can only be read by setting it, which would race
+# with other threads creating files
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+
+def replace_atomically(path, write):
+    """
+    Call write(tmp_path) on a temporary file next to path, then rename it over path.
+    Readers (and a crash) only ever see the old file or the complete new one.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp"
+    )
+    os.close(fd)
+    try:
+        write(tmp_path)
+        # mkstemp creates the file 0600; keep the target's mode, or give a new file
+        # the mode open() would have
+        os.chmod(tmp_path, _file_mode(path))
+        with open(tmp_path, "rb") as tmp:
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_directory(directory)
+
+
+def _file_mode(path):
+    # Permission bits of an existing file, else 0666 minus the umask
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def _fsync_directory(directory):
+    # Make a rename in directory durable; not every platform can open a directory
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# One lock per journal file, shared by every ChangeJournal for that path in the process
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(path):
+    with _locks_guard:
+        return _locks.setdefault(os.path.abspath(path), threading.RLock())
+
+
+def _to_builtin(value):
+    # numpy scalars (e.g. Year read back from the DataFrame) are not JSON serializable
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__} to the journal")
+
+
+class ChangeJournal:
+    """
+    Append-only log of problem mutations kept next to the database CSV.
+
+    Each line is one JSON record: {"op": "add"|"update"|"delete", "id": ..., "row": {...}}.
+    Add and update records carry the full row and are replayed as upserts, so replaying a
+    journal on top of a CSV that already contains its changes is harmless.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = _lock_for(path)
+
+    def append(self, op, problem_id, row=None):
+        """
+        Append one record and fsync it before returning.
+        """
+        record = {"op": op, "id": problem_id}
+        if row is not None:
+            record["row"] = row
+        line = json.dumps(record, default=_to_builtin, ensure_ascii=False) + "\n"
+        with self.lock, open(self.path, "a+b") as journal:
+            # A crash mid-append leaves a torn last line; cut it off so this record
+            # starts on a clean line
+            end = journal.seek(0, os.SEEK_END)
+            if end:
+                journal.seek(end - 1)
+                if journal.read(1) != b"\n":
+                    journal.seek(0)
+                    journal.truncate(journal.read().rfind(b"\n") + 1)
+            journal.write(line.encode("utf-8"))
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def size(self):
+        """
+        Return the journal size in bytes (0 if it doesn't exist).
+        """
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def clear(self):
+        """
+        Remove the journal once its records are part of the base CSV.
+        """
+        with self.lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def discard_prefix(self, n_bytes):
+        """
+        Drop the first n_bytes of records (those already folded into the CSV), keeping
+        anything appended since. The remaining tail replaces the journal atomically.
+        """
+        with self.lock:
+            if self.size() <= n_bytes:
+                self.clear()
+                return
+            with open(self.path, "rb") as journal:
+                journal.seek(n_bytes)
+                tail = journal.read()
+
+            def write(path):
+                with open(path, "wb") as out:
+                    out.write(tail)
+
+            replace_atomically(self.path, write)
+
+    def read(self):
+        """
+        Return the records in the journal.
+        A torn last line left by a crash mid-append is ignored (the next append cuts it
+        off), so reading never modifies the file and needs no lock.
+        """
+        if not os.path.exists(self.path):
+            return []
+
+        records = []
+        with open(self.path, "rb") as journal:
+            for line in journal:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+        return records
+
+    def replay(self, df, records=None):
+        """
+        Apply the journal (or records already read from it) to the base DataFrame and
+        return the result. Only the rows named in the journal are touched; the last
+        record per ID wins.
+        """
+        if records is None:
+            records = self.read()
+        if not records:
+            return df
+
+        # Last record per ID wins; None marks a deletion
+        final_rows = {}
+        for record in records:
+            final_rows[record["id"]] = record.get("row")
+        upserts = pd.DataFrame.from_dict(
+            {i: row for i, row in final_rows.items() if row is not None}, orient="index"
+        )
+        deleted = [i for i, row in final_rows.items() if row is None]
+
+        ids = df["Custom_Problem_ID"]
+        # Rows already in df are patched in place, one whole-column assignment per
+        # column (every row of an ID, should it occur more than once)
+        updated = ids.isin(list(upserts.index)).to_numpy()
+        if updated.any():
+            patch = upserts.loc[ids[updated].to_numpy()]
+            df = df.copy()
+            for column in patch.columns.intersection(df.columns):
+                values = df[column].to_numpy(dtype=object)
+                values[updated] = patch[column].to_numpy(dtype=object)
+                # Categorical columns come back as plain values rather than having
+                # categories added; the table re-encodes every column on load
+                df[column] = pd.Series(values, index=df.index).infer_objects()
+        df = df[~ids.isin(deleted).to_numpy()]
+
+        existing = set(ids[updated])
+        added = upserts[[problem_id not in existing for problem_id in upserts.index]]
+        if len(added) > 0:
+            df = pd.concat([df, added], ignore_index=True)
+        return df
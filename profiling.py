@@ -0,0 +1,192 @@
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Spans kept per session; older ones are dropped from the panel and the trace
+MAX_SPANS = 20_000
+# Functions listed in a rerun's cProfile summary
+PROFILE_LINES = 40
+
+# The profiler recording the current rerun; unset (the default) means spans are free
+_active = contextvars.ContextVar("profiler", default=None)
+
+
+def path_bytes(paths):
+    """
+    Total size of the files in paths that exist.
+    """
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+class Profiler:
+    """
+    Timing spans for one session, recorded while one of its reruns is active.
+
+    Methods decorated with traced() add a span (name, start, duration, nesting depth and
+    counters such as rows and bytes) when they run inside rerun(); otherwise they cost a
+    context variable lookup. Spans export to the Chrome trace event format, which
+    chrome://tracing and https://ui.perfetto.dev open directly. A single rerun can also
+    be run under cProfile.
+    """
+
+    def __init__(self, max_spans=MAX_SPANS):
+        self.spans = deque(maxlen=max_spans)
+        self.reruns = 0
+        self.origin = time.perf_counter()
+        self.profile_next = False
+        self.profile_stats = None
+        self.profile_dump = None
+        self._depth = threading.local()
+
+    @contextmanager
+    def rerun(self):
+        """
+        Record the spans of one rerun (itself a "rerun" span), under cProfile if
+        profile_next was set.
+        """
+        token = _active.set(self)
+        profile = cProfile.Profile() if self.profile_next else None
+        self.profile_next = False
+        self.reruns += 1
+        try:
+            with self.span("rerun", rerun=self.reruns):
+                if profile is None:
+                    yield self
+                else:
+                    profile.enable()
+                    try:
+                        yield self
+                    finally:
+                        profile.disable()
+                        self._keep_profile(profile)
+        finally:
+            _active.reset(token)
+
+    @contextmanager
+    def span(self, name, **counters):
+        """
+        Time the enclosed block. Counters (e.g. rows=, bytes=) are stored with the span;
+        the yielded dict can be updated with more of them before the block ends.
+        """
+        depth = getattr(self._depth, "value", 0)
+        self._depth.value = depth + 1
+        start = time.perf_counter()
+        try:
+            yield counters
+        finally:
+            end = time.perf_counter()
+            self._depth.value = depth
+            self.spans.append(
+                {
+                    "name": name,
+                    "rerun": self.reruns,
+                    "start": start - self.origin,
+                    "duration": end - start,
+                    "depth": depth,
+                    "thread": threading.get_ident(),
+                    "counters": counters,
+                }
+            )
+
+    def _keep_profile(self, profile):
+        out = io.StringIO()
+        stats = pstats.Stats(profile, stream=out)
+        stats.sort_stats("cumulative").print_stats(PROFILE_LINES)
+        self.profile_stats = out.getvalue()
+        # The binary .prof file, for snakeviz or pstats
+        self.profile_dump = _profile_bytes(profile)
+
+    def last_rerun(self):
+        """
+        Spans of the most recent finished rerun, in start order.
+        """
+        finished = [span["rerun"] for span in self.spans if span["name"] == "rerun"]
+        if not finished:
+            return []
+        rerun = finished[-1]
+        return sorted(
+            (span for span in self.spans if span["rerun"] == rerun),
+            key=lambda span: span["start"],
+        )
+
+    def summary(self):
+        """
+        Per span name across the session: calls, total, mean and max milliseconds.
+        """
+        totals = {}
+        for span in self.spans:
+            entry = totals.setdefault(
+                span["name"], {"calls": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            ms = span["duration"] * 1000
+            entry["calls"] += 1
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+        for entry in totals.values():
+            entry["mean_ms"] = entry["total_ms"] / entry["calls"]
+        return totals
+
+    def chrome_trace(self):
+        """
+        The recorded spans as Chrome trace JSON ("X" complete events, microseconds).
+        """
+        events = [
+            {
+                "name": span["name"],
+                "cat": "rerun" if span["name"] == "rerun" else "method",
+                "ph": "X",
+                "ts": round(span["start"] * 1e6, 3),
+                "dur": round(span["duration"] * 1e6, 3),
+                "pid": os.getpid(),
+                "tid": span["thread"],
+                "args": span["counters"],
+            }
+            for span in self.spans
+        ]
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"})
+
+
+def _profile_bytes(profile):
+    # cProfile only dumps to a path
+    handle, path = tempfile.mkstemp(suffix=".prof")
+    os.close(handle)
+    try:
+        profile.dump_stats(path)
+        with open(path, "rb") as dump:
+            return dump.read()
+    finally:
+        os.remove(path)
+
+
+def traced(name=None, measure=None):
+    """
+    Decorator recording a span for each call while a profiler is active.
+    measure(self, result) returns counters for the span, e.g. {"rows": ..., "bytes": ...}.
+    """
+
+    def decorate(method):
+        span_name = name or method.__name__
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            profiler = _active.get()
+            if profiler is None:
+                return method(self, *args, **kwargs)
+            with profiler.span(span_name) as counters:
+                result = method(self, *args, **kwargs)
+                if measure is not None:
+                    counters.update(measure(self, result))
+                return result
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,34 @@
+import json
+import os
+
+# Banks the app can serve: name -> {"db": problems CSV, "categories": categories CSV,
+# optionally "sqlite": SQLite database used instead of the CSVs, and "title"}
+REGISTRY_FILE = "banks.json"
+
+
+def load_registry(path=None):
+    """
+    Read the bank registry (PROBLEM_DB_REGISTRY, else banks.json) and return it as
+    {name: entry} in file order. Relative paths are taken relative to the registry.
+    """
+    path = path or os.environ.get("PROBLEM_DB_REGISTRY", REGISTRY_FILE)
+    try:
+        with open(path, encoding="utf-8") as registry:
+            banks = json.load(registry)
+    except FileNotFoundError:
+        raise ValueError(f"Bank registry {path!r} does not exist!") from None
+    if not isinstance(banks, dict) or not banks:
+        raise ValueError(f"Bank registry {path!r} lists no banks!")
+
+    base = os.path.dirname(path)
+    for name, entry in banks.items():
+        missing = [field for field in ("db", "categories") if field not in entry]
+        if missing:
+            raise ValueError(
+                f"Bank {name!r} in {path!r} is missing {', '.join(missing)}!"
+            )
+        entry.setdefault("title", name)
+        for field in ("db", "categories", "sqlite"):
+            if entry.get(field):
+                entry[field] = os.path.join(base, entry[field])
+    return banks
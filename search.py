@@ -0,0 +1,140 @@
+import bisect
+import heapq
+from collections import Counter
+
+# Results returned when the caller doesn't ask for a number
+DEFAULT_LIMIT = 10
+# Candidates examined per substring/fuzzy lookup; bounds the cost of very common trigrams
+SCAN_LIMIT = 500
+
+
+def trigrams(text):
+    """
+    Return the set of 3-character substrings of a (normalized) string.
+    """
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """
+    Typeahead index over short strings such as problem IDs and tag names.
+
+    Entries are (kind, text) pairs, e.g. ("problem", "2010_P05") or ("tag", "Rate law"),
+    matched case-insensitively. Prefix matches come from a sorted list (binary search);
+    substring and typo-tolerant matches come from a trigram -> entries inverted index.
+    Results are ranked exact, prefix, substring, then fuzzy, and only `limit` are built,
+    so a query costs about the same on a hundred entries as on a hundred thousand.
+    """
+
+    def __init__(self, entries=()):
+        self.entries = set(entries)
+        # Entries are stored as (lowercased text, kind, text) keys
+        self.sorted = sorted((text.lower(), kind, text) for kind, text in self.entries)
+        self.postings = {}
+        for key in self.sorted:
+            for gram in trigrams(key[0]):
+                self.postings.setdefault(gram, set()).add(key)
+
+    def __contains__(self, entry):
+        return entry in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, kind, text):
+        """
+        Index one entry (no-op if it is already there).
+        """
+        if (kind, text) in self.entries:
+            return
+        self.entries.add((kind, text))
+        key = (text.lower(), kind, text)
+        bisect.insort(self.sorted, key)
+        for gram in trigrams(key[0]):
+            self.postings.setdefault(gram, set()).add(key)
+
+    def discard(self, kind, text):
+        """
+        Drop one entry if it is indexed.
+        """
+        if (kind, text) not in self.entries:
+            return
+        self.entries.discard((kind, text))
+        key = (text.lower(), kind, text)
+        i = bisect.bisect_left(self.sorted, key)
+        if i < len(self.sorted) and self.sorted[i] == key:
+            del self.sorted[i]
+        for gram in trigrams(key[0]):
+            keys = self.postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[gram]
+
+    def search(self, query, limit=DEFAULT_LIMIT, kind=None):
+        """
+        Return up to limit (kind, text) entries matching query, best first.
+        With kind, only entries of that kind are returned.
+        """
+        query = query.strip().lower()
+        if not query or limit <= 0:
+            return []
+
+        results = []
+        seen = set()
+
+        def take(ranked):
+            # ranked: (sort key..., entry) tuples; a tier can repeat at most `limit`
+            # prefix matches already taken, so 2 * limit candidates always suffice
+            for *_, entry in heapq.nsmallest(limit * 2, ranked):
+                if len(results) >= limit:
+                    return
+                if entry not in seen:
+                    seen.add(entry)
+                    results.append(entry)
+
+        # Exact and prefix matches: a contiguous run of the sorted list, where an exact
+        # match sorts before the longer strings it prefixes
+        start = bisect.bisect_left(self.sorted, (query,))
+        for i in range(start, min(len(self.sorted), start + SCAN_LIMIT)):
+            text, entry_kind, original = self.sorted[i]
+            if not text.startswith(query) or len(results) >= limit:
+                break
+            if kind is None or entry_kind == kind:
+                seen.add((entry_kind, original))
+                results.append((entry_kind, original))
+        if len(results) >= limit or len(query) < 3:
+            return results
+
+        grams = sorted(trigrams(query), key=lambda gram: len(self.postings.get(gram, ())))
+        take(self._substrings(query, grams, kind))
+        if len(results) < limit:
+            take(self._fuzzy(grams, kind))
+        return results
+
+    def _substrings(self, query, grams, kind):
+        # Entries containing the query contain all its trigrams; scan the rarest list
+        matches = []
+        for scanned, (text, entry_kind, original) in enumerate(
+            self.postings.get(grams[0], ())
+        ):
+            if scanned >= SCAN_LIMIT:
+                break
+            position = text.find(query)
+            if position >= 0 and (kind is None or entry_kind == kind):
+                matches.append((position, len(text), text, (entry_kind, original)))
+        return matches
+
+    def _fuzzy(self, grams, kind):
+        # Typos: entries sharing at least half of the query's trigrams, most shared first
+        scores = Counter()
+        for gram in grams:
+            keys = self.postings.get(gram, ())
+            if len(keys) <= SCAN_LIMIT:
+                scores.update(keys)
+        needed = max(1, (len(grams) + 1) // 2)
+        return [
+            (-score, len(text), text, (entry_kind, original))
+            for (text, entry_kind, original), score in scores.items()
+            if score >= needed and (kind is None or entry_kind == kind)
+        ]
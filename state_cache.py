@@ -0,0 +1,151 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Memory budget of the cache in MiB, overridden by PROBLEM_DB_CACHE_MB
+CACHE_MEGABYTES = 1024
+
+
+def file_signature(*paths):
+    """
+    Return a tuple of (mtime_ns, size) pairs for the given files.
+    Missing files contribute None, so creating or deleting a file also changes the signature.
+    """
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            signature.append(None)
+        else:
+            signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class StateCache:
+    """
+    Process-wide cache of parsed file state.
+
+    Streamlit re-executes app.py on every widget interaction, so anything kept in the
+    script's globals is lost between reruns. This module is imported, which keeps it
+    alive in sys.modules for the lifetime of the server process.
+
+    Entries are kept in least recently used order. When the values' sizes (as reported
+    by the sizeof passed to get() or put()) add up to more than max_bytes, the least
+    recently used entries are dropped; an on_evict() callback registered for a key runs
+    first, so state that is still only in memory (e.g. queued writes) heads to disk. It
+    runs in the thread that stored the new entry, which may hold locks, so it must not
+    block on anything. The entry just stored is never evicted, even if it alone exceeds the budget.
+    """
+
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            megabytes = float(os.environ.get("PROBLEM_DB_CACHE_MB", CACHE_MEGABYTES))
+            max_bytes = int(megabytes * 2**20)
+        self.max_bytes = max_bytes
+        # key -> (signature, value, bytes), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._state_locks = {}
+        self._on_evict = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, paths, loader, sizeof=None):
+        """
+        Return the cached value for key, calling loader() only if the files in paths
+        changed on disk since the value was stored. sizeof(value) gives the bytes the
+        value holds; without it the value doesn't count towards the budget.
+        """
+        signature = file_signature(*paths)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[1]
+            self.misses += 1
+
+        value = loader()
+        self._store(key, signature, value, sizeof)
+        return value
+
+    def put(self, key, paths, value, sizeof=None):
+        """
+        Store a value written by this process, stamped with the files' current signature
+        so the next get() is a hit instead of re-reading what we just wrote.
+        """
+        self._store(key, file_signature(*paths), value, sizeof)
+
+    def _store(self, key, signature, value, sizeof):
+        nbytes = int(sizeof(value)) if sizeof is not None else 0
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self._entries[key] = (signature, value, nbytes)
+            self.bytes += nbytes
+            evicted = []
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, (_, _, old_bytes) = self._entries.popitem(last=False)
+                self.bytes -= old_bytes
+                self.evictions += 1
+                evicted.append(old_key)
+            callbacks = [self._on_evict[k] for k in evicted if k in self._on_evict]
+        # Outside the lock: a flush may take a while, or read the cache itself
+        for callback in callbacks:
+            callback()
+
+    def on_evict(self, key, callback):
+        """
+        Call callback() whenever the entry for key is evicted to stay within budget.
+        """
+        with self._lock:
+            self._on_evict[key] = callback
+
+    def lock(self, key):
+        """
+        Return the lock guarding mutations of the state cached under key.
+        Cached values are shared by every session in the process, so writers take turns.
+        """
+        with self._lock:
+            return self._state_locks.setdefault(key, threading.RLock())
+
+    def invalidate(self, key=None):
+        """
+        Drop one entry, or every entry if no key is given.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self.bytes = 0
+            else:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self.bytes -= entry[2]
+
+    def stats(self):
+        """
+        Return the hit/miss/eviction counters and the number and size of cached entries.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def keys(self):
+        """
+        The cached keys, least recently used first.
+        """
+        with self._lock:
+            return list(self._entries)
+
+
+STATE_CACHE = StateCache()
@@ -0,0 +1,491 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import pandas as pd
+
+from journal import ChangeJournal, replace_atomically
+from locking import file_lock
+from state_cache import file_signature
+from tags import TAG_FIELDS, split_tags
+
+try:
+    import pyarrow as pa
+    from pyarrow import ipc
+except ImportError:  # pyarrow ships with streamlit; without it snapshots are skipped
+    pa = ipc = None
+
+logger = logging.getLogger(__name__)
+# Problem CSVs already warned about loading without a snapshot, to warn once each
+_unsnapshotted = set()
+
+PROBLEM_COLUMNS = [
+    "Custom_Problem_ID",
+    "Category",
+    "Subcategory",
+    "Year",
+    "Focus_Category",
+    "Focus_Subcategory",
+]
+CATEGORY_COLUMNS = ["Category", "Subcategory"]
+
+# Journal size at which a journaled CSV store asks for a full rewrite
+JOURNAL_COMPACT_BYTES = 1 << 20
+
+
+class CsvStorage:
+    """
+    Problems and categories in two CSV files, optionally with an append-only change journal.
+
+    Every backend offers the same methods: read_problems/read_categories return
+    DataFrames, write_problems/write_categories replace everything, and write_change
+    persists one add/update/delete, returning False if the caller should follow up
+    with a full write_problems instead; compaction_due says when a journaled backend
+    would like that full rewrite anyway.
+
+    Writes hold the cross-process `lock` and bump `version()`, a counter shared by every
+    process using the files. Reads take no lock: files are only ever replaced
+    atomically, and the journal is read before the CSV it applies to.
+    """
+
+    def __init__(
+        self,
+        db_file,
+        categories_file,
+        journal=False,
+        journal_compact_bytes=JOURNAL_COMPACT_BYTES,
+        snapshot=True,
+    ):
+        self.db_file = db_file
+        self.categories_file = categories_file
+        # In journal mode each edit appends one record instead of rewriting the CSV
+        self.journal = (
+            ChangeJournal(os.path.splitext(db_file)[0] + ".journal") if journal else None
+        )
+        self.journal_compact_bytes = journal_compact_bytes
+        # Columnar copy of the CSV that loads without text parsing
+        self.snapshot_file = (
+            os.path.splitext(db_file)[0] + ".arrow" if snapshot and pa else None
+        )
+        if snapshot and pa is None and db_file not in _unsnapshotted:
+            _unsnapshotted.add(db_file)
+            logger.warning(
+                "pyarrow is not installed: %s will be parsed from CSV on every load",
+                db_file,
+            )
+        base = os.path.splitext(db_file)[0]
+        self.lock = file_lock(base + ".lock")
+        self.version_file = base + ".version"
+        self.key = os.path.abspath(db_file)
+
+    def version(self):
+        """
+        Return the bank's version: the number of writes made to it by any process.
+        """
+        try:
+            with open(self.version_file, encoding="utf-8") as version_file:
+                return int(version_file.read() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _bump_version(self):
+        # Called with self.lock held, after the write it counts
+        version = self.version() + 1
+
+        def write(path):
+            with open(path, "w", encoding="utf-8") as version_file:
+                version_file.write(str(version))
+
+        replace_atomically(self.version_file, write)
+
+    def problem_paths(self):
+        """
+        Files whose changes invalidate cached problems.
+        """
+        if self.journal:
+            return [self.db_file, self.journal.path, self.version_file]
+        return [self.db_file, self.version_file]
+
+    def category_paths(self):
+        """
+        Files whose changes invalidate cached categories.
+        """
+        return [self.categories_file, self.version_file]
+
+    def read_problems(self):
+        """
+        Read the problem CSV (plus any journaled edits), or an empty frame if it doesn't exist.
+        The CSV itself is only parsed when the columnar snapshot is missing or stale.
+        """
+        # Journal first: a compaction rewrites the CSV before trimming the journal, so
+        # at worst we replay records the CSV already contains, which is harmless
+        records = self.journal.read() if self.journal else []
+        if os.path.exists(self.db_file):
+            df = self.read_snapshot()
+            if df is None:
+                signature = file_signature(self.db_file)
+                df = pd.read_csv(self.db_file)
+                self.write_snapshot(df, signature)
+        else:
+            df = pd.DataFrame(columns=PROBLEM_COLUMNS)
+        if self.journal:
+            df = self.journal.replay(df, records)
+        return df
+
+    def read_categories(self):
+        """
+        Read the (Category, Subcategory) pairs, or an empty frame if the file doesn't exist.
+        """
+        if os.path.exists(self.categories_file):
+            return pd.read_csv(self.categories_file)
+        return pd.DataFrame(columns=CATEGORY_COLUMNS)
+
+    def _csv_identity(self):
+        # A new inode on every atomic rewrite, so this changes whenever anyone rewrites the CSV
+        try:
+            stat = os.stat(self.db_file)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def checkpoint(self):
+        """
+        Mark how much of the journal a DataFrame taken right after this call contains,
+        and which CSV it sits on. Pass the result to write_problems when the write
+        happens later (in the background).
+        """
+        return (self.journal.size() if self.journal else 0, self._csv_identity())
+
+    def compaction_due(self):
+        """
+        Whether the journal has grown enough to be folded into the CSV.
+        """
+        return bool(self.journal) and self.journal.size() >= self.journal_compact_bytes
+
+    def write_problems(self, df, checkpoint=None):
+        """
+        Atomically rewrite the problem CSV, folding in the journal, and return True.
+        With a checkpoint only the journal records before it are dropped; records
+        appended since are kept and replay harmlessly on top of this CSV. If someone
+        else rewrote the CSV after the checkpoint, df is outdated and nothing is
+        written (returns False).
+        """
+        with self.lock:
+            if checkpoint is not None and checkpoint[1] != self._csv_identity():
+                return False
+            replace_atomically(self.db_file, lambda path: df.to_csv(path, index=False))
+            self.write_snapshot(df)
+            if self.journal:
+                if checkpoint is None:
+                    self.journal.clear()
+                else:
+                    self.journal.discard_prefix(checkpoint[0])
+            self._bump_version()
+        return True
+
+    def read_snapshot(self):
+        """
+        Memory-map the Arrow IPC snapshot and return it as a DataFrame, or None if there
+        is no snapshot or it was taken from a different version of the CSV.
+        """
+        if not self.snapshot_file or not os.path.exists(self.snapshot_file):
+            return None
+        try:
+            with pa.memory_map(self.snapshot_file, "r") as source:
+                table = ipc.open_file(source).read_all()
+        except (OSError, pa.ArrowInvalid):
+            return None
+
+        metadata = table.schema.metadata or {}
+        taken_from = json.loads(metadata.get(b"csv_signature", b"null"))
+        if taken_from != json.loads(json.dumps(file_signature(self.db_file))):
+            return None
+
+        # Tag columns are dictionary-encoded on disk and load as categoricals, the same
+        # compact form ProblemTable keeps them in, without decoding every row
+        return table.to_pandas()
+
+    def write_snapshot(self, df, signature=None):
+        """
+        Write the Arrow IPC snapshot of df, the CSV as it is now on disk (or as it was
+        when it had the given signature).
+        """
+        if not self.snapshot_file:
+            return
+        if signature is None:
+            signature = file_signature(self.db_file)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        for i, field in enumerate(table.schema):
+            if field.name in TAG_FIELDS and not pa.types.is_dictionary(field.type):
+                table = table.set_column(i, field.name, table.column(i).dictionary_encode())
+        table = table.replace_schema_metadata(
+            {"csv_signature": json.dumps(signature)}
+        )
+
+        def write(path):
+            with pa.OSFile(path, "wb") as sink:
+                with ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+
+        replace_atomically(self.snapshot_file, write)
+
+    def write_categories(self, df_categories):
+        """
+        Atomically rewrite the categories CSV.
+        """
+        with self.lock:
+            replace_atomically(
+                self.categories_file, lambda path: df_categories.to_csv(path, index=False)
+            )
+            self._bump_version()
+
+    def write_change(self, op, problem_id, row=None):
+        """
+        Journal one change and return True. Without a journal, return False so the
+        caller rewrites the whole CSV.
+        """
+        if not self.journal:
+            return False
+        with self.lock:
+            self.journal.append(op, problem_id, row)
+            self._bump_version()
+        return True
+
+
+class SqliteStorage:
+    """
+    Problems and categories in a SQLite database in WAL mode.
+
+    Tags are also kept in an indexed (field, tag, problem) join table, so point edits
+    and tag lookups are indexed SQL operations and every write is one transaction.
+    Readers never block on the single writer in WAL mode. The version counter is the
+    database's user_version, bumped in the same transaction as each write.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS problems (
+            Custom_Problem_ID TEXT PRIMARY KEY,
+            Category TEXT NOT NULL DEFAULT '',
+            Subcategory TEXT NOT NULL DEFAULT '',
+            Year INTEGER,
+            Focus_Category TEXT NOT NULL DEFAULT '',
+            Focus_Subcategory TEXT NOT NULL DEFAULT ''
+        );
+        CREATE TABLE IF NOT EXISTS problem_tags (
+            field TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            problem_id TEXT NOT NULL
+                REFERENCES problems(Custom_Problem_ID) ON DELETE CASCADE,
+            PRIMARY KEY (field, tag, problem_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS problem_tags_by_problem ON problem_tags(problem_id);
+        CREATE TABLE IF NOT EXISTS categories (
+            Category TEXT NOT NULL,
+            Subcategory TEXT NOT NULL,
+            PRIMARY KEY (Category, Subcategory)
+        );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.key = os.path.abspath(path)
+        self.lock = file_lock(path + ".lock")
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation: Streamlit sessions run on
+        # different threads and sqlite3 connections must not cross threads.
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def version(self):
+        """
+        Return the number of writes made to the database by any process.
+        """
+        with self._connect() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def _bump_version(self, conn):
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        conn.execute(f"PRAGMA user_version = {version + 1}")
+
+    def problem_paths(self):
+        """
+        Files whose changes invalidate cached state; committed writes land in the -wal file first.
+        """
+        return [self.path, self.path + "-wal"]
+
+    def category_paths(self):
+        """
+        Categories live in the same database file.
+        """
+        return self.problem_paths()
+
+    def read_problems(self):
+        """
+        Read all problems in insertion order.
+        """
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                f"SELECT {', '.join(PROBLEM_COLUMNS)} FROM problems ORDER BY rowid", conn
+            )
+
+    def read_categories(self):
+        """
+        Read the (Category, Subcategory) pairs in insertion order.
+        """
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                "SELECT Category, Subcategory FROM categories ORDER BY rowid", conn
+            )
+
+    def _problem_values(self, row):
+        # Column values in PROBLEM_COLUMNS order, with missing tags stored as ''
+        values = [
+            "" if pd.isna(row.get(column)) else row.get(column)
+            for column in PROBLEM_COLUMNS
+        ]
+        values[PROBLEM_COLUMNS.index("Year")] = (
+            None if pd.isna(row.get("Year")) else int(row.get("Year"))
+        )
+        return values
+
+    def _tag_rows(self, row):
+        return [
+            (field, tag, row["Custom_Problem_ID"])
+            for field in TAG_FIELDS
+            for tag in dict.fromkeys(split_tags(row.get(field)))
+        ]
+
+    def _insert(self, conn, rows, upsert=False):
+        conflict = ""
+        if upsert:
+            conflict = "ON CONFLICT(Custom_Problem_ID) DO UPDATE SET " + ", ".join(
+                f"{column} = excluded.{column}" for column in PROBLEM_COLUMNS[1:]
+            )
+        conn.executemany(
+            f"INSERT INTO problems ({', '.join(PROBLEM_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in PROBLEM_COLUMNS)}) {conflict}",
+            [self._problem_values(row) for row in rows],
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO problem_tags (field, tag, problem_id) VALUES (?, ?, ?)",
+            [tag_row for row in rows for tag_row in self._tag_rows(row)],
+        )
+
+    def checkpoint(self):
+        """
+        SQLite writes are transactional, so there is nothing to mark.
+        """
+        return None
+
+    def compaction_due(self):
+        """
+        There is no journal to fold in.
+        """
+        return False
+
+    def write_problems(self, df, checkpoint=None):
+        """
+        Replace every problem in one transaction.
+        Custom_Problem_ID is the primary key, so for duplicate IDs the last row wins.
+        """
+        with self.lock, self._connect() as conn:
+            conn.execute("DELETE FROM problems")
+            self._insert(conn, df.to_dict("records"), upsert=True)
+            self._bump_version(conn)
+        return True
+
+    def write_categories(self, df_categories):
+        """
+        Replace the categories in one transaction.
+        """
+        with self.lock, self._connect() as conn:
+            conn.execute("DELETE FROM categories")
+            conn.executemany(
+                "INSERT OR IGNORE INTO categories (Category, Subcategory) VALUES (?, ?)",
+                df_categories[CATEGORY_COLUMNS].itertuples(index=False, name=None),
+            )
+            self._bump_version(conn)
+
+    def write_change(self, op, problem_id, row=None):
+        """
+        Apply one add/update/delete as a single indexed transaction.
+        """
+        with self.lock, self._connect() as conn:
+            if op == "delete":
+                conn.execute(
+                    "DELETE FROM problems WHERE Custom_Problem_ID = ?", (problem_id,)
+                )
+            else:
+                conn.execute(
+                    "DELETE FROM problem_tags WHERE problem_id = ?", (problem_id,)
+                )
+                self._insert(conn, [row], upsert=True)
+            self._bump_version(conn)
+        return True
+
+    def find(self, field, tags):
+        """
+        Return the IDs of problems whose field includes every tag, using the tag index.
+        """
+        if not tags:
+            return []
+        query = " INTERSECT ".join(
+            "SELECT problem_id FROM problem_tags WHERE field = ? AND tag = ?"
+            for _ in tags
+        )
+        params = [value for tag in tags for value in (field, tag)]
+        with self._connect() as conn:
+            return [problem_id for (problem_id,) in conn.execute(query, params)]
+
+
+def migrate_csv_to_sqlite(db_file, categories_file, sqlite_path):
+    """
+    One-shot copy of a CSV problem bank (including any pending journal) into SQLite.
+    Returns the new storage and the IDs that were duplicated in the CSV (only their
+    last row is kept).
+    """
+    source = CsvStorage(
+        db_file,
+        categories_file,
+        journal=os.path.exists(os.path.splitext(db_file)[0] + ".journal"),
+    )
+    target = SqliteStorage(sqlite_path)
+    df = source.read_problems()
+    duplicated = df.loc[
+        df["Custom_Problem_ID"].duplicated(), "Custom_Problem_ID"
+    ].unique().tolist()
+    target.write_categories(source.read_categories())
+    target.write_problems(df)
+    return target, duplicated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Migrate a CSV problem bank into a SQLite database."
+    )
+    parser.add_argument("db_file", help="Problem CSV, e.g. db/incho_db.csv")
+    parser.add_argument(
+        "categories_file", help="Categories CSV, e.g. categories/incho_categories.csv"
+    )
+    parser.add_argument("sqlite_path", help="SQLite database to create, e.g. db/incho.sqlite")
+    args = parser.parse_args()
+    _, duplicated = migrate_csv_to_sqlite(
+        args.db_file, args.categories_file, args.sqlite_path
+    )
+    print(f"Migrated {args.db_file} and {args.categories_file} into {args.sqlite_path}")
+    if duplicated:
+        print(f"Kept only the last row for duplicate IDs: {', '.join(duplicated)}")
@@ -0,0 +1,700 @@
+import hashlib
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from analytics import ProblemStats
+from integrity import IntegrityIndex
+from search import SearchIndex
+from tags import TAG_FIELDS, TagMatrix, TagPostings, rewrite_tags, split_tags
+
+# Compact once tombstones exceed both of these (count, and fraction of stored rows)
+TOMBSTONE_MIN = 64
+TOMBSTONE_RATIO = 0.25
+# In-memory Year type while every year fits (and none is missing)
+YEAR_DTYPE = np.int16
+# Tag columns are dictionary-encoded when distinct values are at most this share of
+# rows; above it new values keep arriving and each one costs a categories rebuild
+CATEGORY_MAX_RATIO = 0.05
+
+
+def compact_dtypes(df):
+    """
+    Return df with compact column types: tag columns whose values repeat as
+    categoricals (each distinct tag string is stored once and rows hold small integer
+    codes), Year as YEAR_DTYPE when every value fits, and IDs as a string array rather
+    than Python objects.
+    """
+    df = df.copy()
+    for field in TAG_FIELDS:
+        if field in df.columns:
+            codes, uniques = pd.factorize(df[field])
+            if len(uniques) <= CATEGORY_MAX_RATIO * len(df):
+                df[field] = pd.Series(
+                    _categorical(codes, pd.Index(uniques, dtype=object)), index=df.index
+                )
+            elif isinstance(df[field].dtype, pd.CategoricalDtype):
+                # Already encoded (the snapshot stores every tag column that way) but
+                # too varied to stay so
+                df[field] = df[field].astype("str")
+    if "Year" in df.columns and _fits_year(df["Year"]):
+        df["Year"] = df["Year"].astype(YEAR_DTYPE)
+    if "Custom_Problem_ID" in df.columns:
+        df["Custom_Problem_ID"] = df["Custom_Problem_ID"].astype("str")
+    return df
+
+
+def _categorical(codes, categories):
+    # "" (no tags) is always a category, so fillna("") works as on a string column
+    if "" not in categories:
+        categories = categories.append(pd.Index([""], dtype=object))
+    return pd.Categorical.from_codes(codes, categories=categories, validate=False)
+
+
+def _as_years(values):
+    years = np.asarray(values)
+    if years.dtype.kind not in "iuf":
+        years = pd.to_numeric(pd.Series(years), errors="coerce").to_numpy(dtype=float)
+    return years
+
+
+def _fits_year(values):
+    # Every value a whole number within YEAR_DTYPE's range (NaN never is)
+    info = np.iinfo(YEAR_DTYPE)
+    years = _as_years(values)
+    return bool(
+        np.all((years == np.round(years)) & (years >= info.min) & (years <= info.max))
+    )
+
+
+def _same(old, new):
+    # Equal cell values, two missing ones included
+    old_missing, new_missing = pd.isna(old), pd.isna(new)
+    if old_missing or new_missing:
+        return old_missing and new_missing
+    return old == new
+
+
+def memory_report(df):
+    """
+    Bytes held by each column of df, as a DataFrame with Column, Dtype and Bytes.
+    """
+    usage = df.memory_usage(index=False, deep=True)
+    return pd.DataFrame(
+        {
+            "Column": usage.index,
+            "Dtype": [str(df[column].dtype) for column in usage.index],
+            "Bytes": usage.to_numpy(),
+        }
+    )
+
+
+def row_version(row):
+    """
+    Fingerprint of a row's values, used as the row's version for compare-and-swap edits.
+    It depends only on the content, so every process computes the same version for the
+    same row, whether it was read from the CSV, the journal or SQLite.
+    """
+    values = []
+    for column in sorted(row):
+        value = row[column]
+        if pd.isna(value):
+            value = ""
+        elif isinstance(value, float) and value.is_integer():
+            value = int(value)
+        values.append(f"{column}={value}")
+    return hashlib.blake2b("\x1f".join(values).encode("utf-8"), digest_size=8).hexdigest()
+
+
+class ProblemTable:
+    """
+    The problem DataFrame together with the indexes that are kept in step with it.
+    All row mutations go through this class so the indexes never drift from the data.
+
+    Rows live in self.frame at fixed positions. Custom_Problem_ID maps to its position
+    through a hash index, and deletes only mark the row dead (a tombstone) until enough
+    accumulate to be worth compacting, so lookup, update and delete are all O(1).
+
+    IDs that already occur on several rows of the loaded data are kept as they are
+    (the integrity check reports them). Edits and deletes of such an ID apply to all
+    of its rows, the way the journal replays them, so the table and a reload agree.
+    """
+
+    def __init__(self, df, vocabulary=()):
+        self.frame = compact_dtypes(df.reset_index(drop=True))
+        # column -> (categories, {category: code}) for the categorical tag columns
+        self._category_codes = {}
+        # column -> array with spare rows that the column's values (a categorical's
+        # codes) are a view of; see _buffer
+        self._buffers = {}
+        self.live = self._live_buffer = np.ones(len(self.frame), dtype=bool)
+        self.n_dead = 0
+        self.index, self.duplicates = self._build_index()
+        self.tags = TagMatrix.from_frame(self.frame, vocabulary)
+        self.postings = TagPostings.from_frame(self.frame)
+        self.stats = ProblemStats(self.tags)
+        self.stats.add(np.arange(len(self.frame)), self.frame["Year"])
+        self.integrity = IntegrityIndex(self.tags)
+        self.search = SearchIndex(
+            [("problem", problem_id) for problem_id in self.index]
+            + [("tag", tag) for tag in self._used_tags()]
+        )
+        self._view = None
+        # Before-images of the rows changed while recording(), else None
+        self._changes = None
+
+    def _build_index(self):
+        # ID -> position of its last live row, and ID -> all its live positions for the
+        # IDs on several rows
+        ids = self.frame["Custom_Problem_ID"].tolist()
+        index, duplicates = {}, {}
+        for position, problem_id in enumerate(ids):
+            if not self.live[position]:
+                continue
+            if problem_id in index:
+                duplicates.setdefault(problem_id, [index[problem_id]]).append(position)
+            index[problem_id] = position
+        return index, duplicates
+
+    def positions(self, problem_id):
+        """
+        Return the positions of every row of a problem ID (one unless it is duplicated).
+        """
+        return self.duplicates.get(problem_id, [self.index[problem_id]])
+
+    @property
+    def df(self):
+        """
+        The live problems, without tombstoned rows.
+        """
+        if self._view is None:
+            self._view = self.frame if self.n_dead == 0 else self.frame[self.live]
+        return self._view
+
+    def __contains__(self, problem_id):
+        return problem_id in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def position(self, problem_id):
+        """
+        Return the row position of a problem ID, or None if it doesn't exist.
+        """
+        return self.index.get(problem_id)
+
+    def row(self, position):
+        """
+        Return the row at a position as a dict of column -> value.
+        """
+        return self.frame.iloc[position].to_dict()
+
+    def row_images(self, problem_ids):
+        """
+        Return {problem ID: row dict, or None if there is no such problem}. A duplicated
+        ID gets a tuple of the row dicts of all its rows, in table order.
+        """
+        images = dict.fromkeys(problem_ids)
+        positions = [self.index[i] for i in problem_ids if i in self.index]
+        for row in self.frame.iloc[positions].to_dict("records"):
+            problem_id = row["Custom_Problem_ID"]
+            images[problem_id] = self._image(problem_id, row)
+        return images
+
+    def _image(self, problem_id, row):
+        # The image of a problem whose (last) row is row; see row_images()
+        if problem_id not in self.duplicates:
+            return row
+        return tuple(self.frame.iloc[self.positions(problem_id)].to_dict("records"))
+
+    def version(self, problem_id):
+        """
+        Return the current version of a problem, or None if it doesn't exist.
+        """
+        position = self.index.get(problem_id)
+        return None if position is None else row_version(self.row(position))
+
+    def append(self, row):
+        """
+        Add one problem (a dict of column -> value) at the end of the table.
+        """
+        problem_id = row["Custom_Problem_ID"]
+        if problem_id in self.index:
+            raise ValueError(f"Problem ID {problem_id!r} already exists")
+
+        self._remember_new([problem_id])
+        self._append_rows(pd.DataFrame([row]))
+        self._append_live(1)
+        self.index[problem_id] = len(self.frame) - 1
+        position = self.tags.append_row(row)
+        self.postings.add(problem_id, row)
+        self.stats.add([position], [row.get("Year")])
+        self.integrity.check([position], [problem_id])
+        self.search.add("problem", problem_id)
+        self._sync_search_tags(self._row_tag_set(row))
+        self._view = None
+
+    def extend(self, df):
+        """
+        Append many problems at once: one concat and one vectorized index update.
+        The caller must have checked that the IDs are new. They should be unique too;
+        an ID repeated in df (restoring a duplicated ID) is kept as a duplicate.
+        """
+        offset = len(self.frame)
+        self._remember_new(df["Custom_Problem_ID"].tolist())
+        self._append_rows(df)
+        self._append_live(len(df))
+        self.index.update(
+            zip(df["Custom_Problem_ID"].tolist(), range(offset, offset + len(df)))
+        )
+        self.tags.append_frame(df)
+        batch = TagPostings.from_frame(df)
+        self.postings.merge(batch)
+        self.stats.add(np.arange(offset, offset + len(df)), df["Year"])
+        self.integrity.check(
+            np.arange(offset, offset + len(df)), df["Custom_Problem_ID"]
+        )
+        repeated = df["Custom_Problem_ID"].duplicated(keep=False).to_numpy()
+        if repeated.any():
+            positions = offset + np.flatnonzero(repeated)
+            for position in positions.tolist():
+                problem_id = df["Custom_Problem_ID"].iloc[position - offset]
+                self.duplicates.setdefault(problem_id, []).append(position)
+            self.integrity.mark_duplicates(positions)
+        for problem_id in df["Custom_Problem_ID"].tolist():
+            self.search.add("problem", problem_id)
+        self._sync_search_tags({tag for field in TAG_FIELDS for tag in batch.tags(field)})
+        self._view = None
+
+    def update(self, problem_id, row):
+        """
+        Overwrite the given columns of a problem.
+        """
+        if problem_id in self.duplicates:
+            self.update_many(pd.DataFrame([row]))
+            return
+        position = self.index[problem_id]
+        self._remember([position])
+        self.stats.remove([position], self.frame["Year"].iloc[[position]])
+        self._assign([position], {column: [value] for column, value in row.items()})
+        old_tags = self._stored_tags(position, row)
+        self.postings.remove(problem_id, old_tags)
+        self.tags.set_row(position, row)
+        self.postings.add(problem_id, row)
+        self.stats.add([position], self.frame["Year"].iloc[[position]])
+        self.integrity.check([position], [problem_id])
+        self._sync_search_tags(self._row_tag_set(old_tags) | self._row_tag_set(row))
+        self._view = None
+
+    def update_many(self, df):
+        """
+        Overwrite existing problems with the rows of df (matched on Custom_Problem_ID),
+        with one assignment per column and one pass over the tag bits like extend().
+        """
+        ids = df["Custom_Problem_ID"].tolist()
+        if any(i in self.duplicates for i in ids):
+            # Every row of a duplicated ID gets the new values
+            pairs = [
+                (row, position)
+                for row, problem_id in enumerate(ids)
+                for position in self.positions(problem_id)
+            ]
+            df = df.iloc[[row for row, _ in pairs]]
+            ids = df["Custom_Problem_ID"].tolist()
+            positions = np.array([position for _, position in pairs], dtype=np.int64)
+        else:
+            positions = np.array([self.index[i] for i in ids], dtype=np.int64)
+        self._update_positions(positions, df)
+
+    def restore(self, problem_id, rows):
+        """
+        Bring a problem ID back to rows, a list of row dicts (several for a duplicated
+        ID). Rows are overwritten in place, in table order, when the ID has as many rows
+        as given; otherwise its rows are deleted and the given ones appended.
+        """
+        positions = self.positions(problem_id) if problem_id in self.index else []
+        if len(positions) == len(rows):
+            positions = np.array(positions, dtype=np.int64)
+            self._update_positions(positions, pd.DataFrame(rows))
+            return
+        if positions:
+            self.delete(problem_id)
+        if rows:
+            self.extend(pd.DataFrame(rows))
+
+    def _update_positions(self, positions, df):
+        # Overwrite the rows at positions with the rows of df, in the same order
+        self._remember(positions)
+        ids = df["Custom_Problem_ID"].tolist()
+        fields = [field for field in TAG_FIELDS if field in df.columns]
+        old = TagPostings.from_frame(
+            self.frame.iloc[positions][["Custom_Problem_ID"] + fields]
+        )
+        new = TagPostings.from_frame(df)
+        self.stats.remove(positions, self.frame["Year"].iloc[positions])
+        self._assign(positions, {column: df[column].to_numpy() for column in df})
+        self.tags.set_rows(positions, df)
+        self.postings.discard(old)
+        self.postings.merge(new)
+        self.stats.add(positions, self.frame["Year"].iloc[positions])
+        self.integrity.check(positions, ids)
+        self._sync_search_tags(
+            {tag for field in fields for tag in old.tags(field) + new.tags(field)}
+        )
+        self._view = None
+
+    def delete(self, problem_id):
+        """
+        Tombstone a problem, compacting the table once enough rows are dead.
+        """
+        positions = self.positions(problem_id)
+        self._remember(positions)
+        del self.index[problem_id]
+        self.duplicates.pop(problem_id, None)
+        self.stats.remove(positions, self.frame["Year"].iloc[positions])
+        old_tags = [self._stored_tags(position, TAG_FIELDS) for position in positions]
+        for position, tags in zip(positions, old_tags):
+            self.postings.remove(problem_id, tags)
+            self.tags.set_row(position, {field: [] for field in TAG_FIELDS})
+        self.search.discard("problem", problem_id)
+        self._sync_search_tags(set().union(*map(self._row_tag_set, old_tags)))
+        self.integrity.clear(positions)
+        self.live[positions] = False
+        self.n_dead += len(positions)
+        self._view = None
+
+        if self.n_dead > max(TOMBSTONE_MIN, TOMBSTONE_RATIO * len(self.frame)):
+            self.compact()
+
+    def rewrite_tags(self, field, mapping, within=None):
+        """
+        Rename or drop tags of one field in every problem carrying them, e.g.
+        rewrite_tags("Category", {"Old": "New", "Gone": None}).
+        within=(field, tag) limits it to problems that also carry that tag. The affected
+        rows are found with one bitset mask and rewritten in one vectorized pass.
+        Returns the number of problems changed.
+        """
+        known = [tag for tag in mapping if tag in self.tags.codes]
+        if not known:
+            return 0
+        mask = self.tags.mask(field, any_of=known) & self.live
+        if within is not None:
+            mask &= self.tags.mask(within[0], all_of=[within[1]])
+        positions = np.flatnonzero(mask)
+        if len(positions) == 0:
+            return 0
+
+        self._remember(positions)
+        ids = set(self.frame["Custom_Problem_ID"].iloc[positions])
+        years = self.frame["Year"].iloc[positions]
+        self.stats.remove(positions, years)
+        rewritten = rewrite_tags(self.frame[field].iloc[positions], mapping)
+        self._assign(positions, {field: rewritten.to_numpy()})
+        self.tags.rewrite(field, positions, mapping)
+        self.postings.rewrite(field, ids, mapping)
+        self.stats.add(positions, years)
+        self.integrity.check(positions, self.frame["Custom_Problem_ID"].iloc[positions])
+        self._sync_search_tags(set(mapping) | {new for new in mapping.values() if new})
+        self._view = None
+        return len(positions)
+
+    def compact(self):
+        """
+        Physically drop tombstoned rows and renumber positions.
+        """
+        if self.n_dead == 0:
+            return
+        self.tags.delete_rows(np.flatnonzero(~self.live))
+        self.frame = self.frame[self.live].reset_index(drop=True)
+        for field in TAG_FIELDS:
+            if isinstance(self.frame[field].dtype, pd.CategoricalDtype):
+                values = self.frame[field].cat.remove_unused_categories()
+                self.frame[field] = _categorical(
+                    values.cat.codes.to_numpy(), values.cat.categories
+                )
+        self._buffers = {}
+        self.live = self._live_buffer = np.ones(len(self.frame), dtype=bool)
+        self.n_dead = 0
+        self.index, self.duplicates = self._build_index()
+        if self.integrity.flags is not None:
+            self.integrity.rebuild(self.frame["Custom_Problem_ID"], self.live)
+        self._view = None
+
+    @contextmanager
+    def recording(self):
+        """
+        Collect the rows changed inside the block. Yields a dict that ends up mapping
+        each changed problem ID to its row (a column -> value dict) as it was before
+        the first change, or None if the block added it.
+        """
+        self._changes = changes = {}
+        try:
+            yield changes
+        finally:
+            self._changes = None
+
+    def _remember(self, positions):
+        # Keep the before-image of the problems whose rows are about to change (all of
+        # a duplicated ID's rows); an earlier one in the same recording wins
+        if self._changes is None:
+            return
+        for row in self.frame.iloc[positions].to_dict("records"):
+            problem_id = row["Custom_Problem_ID"]
+            if problem_id not in self._changes:
+                self._changes[problem_id] = self._image(problem_id, row)
+
+    def _remember_new(self, problem_ids):
+        if self._changes is None:
+            return
+        for problem_id in problem_ids:
+            self._changes.setdefault(problem_id, None)
+
+    def _encode(self, column, values):
+        # (dtype, codes) for values of a categorical column, appending values it doesn't
+        # have yet to its categories (NaN gets code -1). Codes are looked up in a dict
+        # kept per column, as a pandas lookup would rehash every category each time
+        # the categories grow
+        dtype = self.frame[column].dtype
+        categories, lookup = self._category_codes.get(column, (None, None))
+        if categories is not dtype.categories:
+            lookup = {value: code for code, value in enumerate(dtype.categories)}
+        codes = np.full(len(values), -1, dtype=np.int64)
+        new = []
+        for i, value in enumerate(values):
+            if isinstance(value, str):
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(lookup)
+                    new.append(value)
+                codes[i] = code
+        if new:
+            dtype = pd.CategoricalDtype(
+                dtype.categories.append(pd.Index(new, dtype=object))
+            )
+        self._category_codes[column] = (dtype.categories, lookup)
+        return dtype, codes
+
+    def _widen_year(self, values):
+        # A year that doesn't fit YEAR_DTYPE widens the column first
+        if self.frame["Year"].dtype == YEAR_DTYPE and not _fits_year(values):
+            years = _as_years(values)
+            whole = bool(np.all(years == np.round(years)))
+            wider = np.int64 if whole else np.float64
+            self.frame["Year"] = self.frame["Year"].astype(wider)
+
+    def _buffer(self, column, values, n_rows):
+        # Writable array with room for n_rows rows whose start values (a column's
+        # numpy array, or a categorical's codes) are a view of. It is replaced, grown
+        # geometrically as in TagMatrix._reserve, when it is too small or the column
+        # no longer views it, so writes and appends don't copy the whole column
+        buffer = self._buffers.get(column)
+        if (
+            buffer is None
+            or len(buffer) < n_rows
+            or buffer.dtype != values.dtype
+            or not np.may_share_memory(buffer, values)
+        ):
+            buffer = np.empty(max(n_rows, 2 * len(values), 16), dtype=values.dtype)
+            buffer[: len(values)] = values
+            self._buffers[column] = buffer
+        return buffer
+
+    def _write_codes(self, column, dtype, positions, codes, n_rows):
+        # The categorical column of n_rows rows with codes written at positions, in
+        # place when its codes still fit the width pandas uses for dtype's categories
+        width = pd.Categorical.from_codes([], dtype=dtype).codes.dtype
+        current = self.frame[column].array.codes.astype(width, copy=False)
+        buffer = self._buffer(column, current, n_rows)
+        buffer[positions] = codes
+        return pd.Categorical.from_codes(buffer[:n_rows], dtype=dtype, validate=False)
+
+    def _set_columns(self, columns):
+        # Replace whole columns by rebuilding the frame around the arrays, which keeps
+        # them views of their buffers (setting a column copies it)
+        self.frame = pd.DataFrame(
+            {
+                column: columns.get(column, self.frame[column].array)
+                for column in self.frame.columns
+            },
+            copy=False,
+        )
+
+    def _assign(self, positions, columns):
+        # Set {column: values} at row positions, keeping the column types. Categorical
+        # columns are written through their codes (setting values directly would need
+        # every new tag string added as a category first, one pandas call at a time)
+        if "Year" in columns:
+            self._widen_year(columns["Year"])
+        plain, replaced = {}, {}
+        for column, values in columns.items():
+            current = self.frame[column].array
+            if isinstance(current, pd.Categorical):
+                dtype, codes = self._encode(column, values)
+                values = self._write_codes(
+                    column, dtype, positions, codes, len(self.frame)
+                )
+                # New categories, or codes that had to be copied, need a new column
+                if dtype is not current.dtype or not np.may_share_memory(
+                    values.codes, current.codes
+                ):
+                    replaced[column] = values
+            else:
+                plain[column] = values
+        if replaced:
+            self._set_columns(replaced)
+        if len(positions) == 1:
+            # One row: a single .loc call for the columns whose value changes, as a
+            # write to an Arrow string column copies the whole column
+            position = positions[0]
+            plain = {
+                column: values
+                for column, values in plain.items()
+                if not _same(self.frame[column].array[position], values[0])
+            }
+            if plain:
+                self.frame.loc[position, list(plain)] = [
+                    values[0] for values in plain.values()
+                ]
+            return
+        for column, values in plain.items():
+            dtype = self.frame[column].dtype
+            if dtype.kind in "iuf":
+                values = np.asarray(values).astype(dtype)
+            self.frame.loc[positions, column] = values
+
+    def _append_rows(self, df):
+        # Append rows to the frame, keeping its column types. Each column's array is
+        # extended on its own: categorical ones through their codes, as concatenating
+        # categoricals rehashes every category on each call (an O(categories) add).
+        # Codes and numpy columns go into the spare rows of their buffers, and other
+        # extension arrays (Arrow strings) are extended by adding a chunk
+        if "Year" in df:
+            self._widen_year(df["Year"].to_numpy())
+        start, n_rows = len(self.frame), len(self.frame) + len(df)
+        columns = {}
+        for column in self.frame.columns:
+            old = self.frame[column].array
+            values = df[column].tolist() if column in df else [np.nan] * len(df)
+            if isinstance(old, pd.Categorical):
+                dtype, codes = self._encode(column, values)
+                columns[column] = self._write_codes(
+                    column, dtype, slice(start, n_rows), codes, n_rows
+                )
+            elif isinstance(old.dtype, np.dtype):
+                buffer = self._buffer(column, old.to_numpy(), n_rows)
+                buffer[start:n_rows] = pd.array(values, dtype=old.dtype).to_numpy()
+                columns[column] = buffer[:n_rows]
+            else:
+                new = pd.array(values, dtype=old.dtype)
+                columns[column] = type(old)._concat_same_type([old, new])
+        self._set_columns(columns)
+
+    def _append_live(self, count):
+        # Mark count appended rows live. self.live is a view of a buffer with spare
+        # rows, grown like the column buffers
+        n_rows = len(self.live) + count
+        if len(self._live_buffer) < n_rows:
+            buffer = np.zeros(max(n_rows, 2 * len(self.live), 16), dtype=bool)
+            buffer[: len(self.live)] = self.live
+            self._live_buffer = buffer
+        self._live_buffer[len(self.live) : n_rows] = True
+        self.live = self._live_buffer[:n_rows]
+
+    def issues(self, taxonomy):
+        """
+        The integrity issues of the live problems against a Taxonomy (see integrity.py).
+        The whole table is checked on the first call and whenever the taxonomy allows
+        other tags; otherwise only the rows changed since were rechecked.
+        """
+        changed = self.integrity.set_taxonomy(taxonomy)
+        if changed or self.integrity.flags is None:
+            self.integrity.rebuild(self.frame["Custom_Problem_ID"], self.live)
+        return self.integrity.report(self.frame["Custom_Problem_ID"], self.live)
+
+    def memory_report(self):
+        """
+        Bytes held per column of the frame, plus the tag bitsets and the row flags.
+        """
+        report = memory_report(self.frame)
+        extra = pd.DataFrame(
+            {
+                "Column": [f"{field} bitset" for field in TAG_FIELDS] + ["live"],
+                "Dtype": [str(self.tags.words[field].dtype) for field in TAG_FIELDS]
+                + [str(self.live.dtype)],
+                "Bytes": [self.tags.words[field].nbytes for field in TAG_FIELDS]
+                + [self.live.nbytes],
+            }
+        )
+        return pd.concat([report, extra], ignore_index=True)
+
+    def nbytes(self):
+        """
+        Quick estimate of the bytes held: memory_report() without counting the labels of
+        categorical columns, which is what makes that one slow.
+        """
+        return (
+            self.frame.memory_usage(index=False).sum()
+            + sum(self.tags.words[field].nbytes for field in TAG_FIELDS)
+            + self.live.nbytes
+        )
+
+    def _used_tags(self):
+        # Tags carried by at least one problem in any field
+        return {tag for field in TAG_FIELDS for tag in self.postings.tags(field)}
+
+    def _row_tag_set(self, row):
+        return {
+            tag for field in TAG_FIELDS if field in row for tag in split_tags(row[field])
+        }
+
+    def _sync_search_tags(self, tags):
+        # Tags are searchable while at least one problem carries them
+        for tag in tags:
+            if any(self.postings.lookup(field, tag) for field in TAG_FIELDS):
+                self.search.add("tag", tag)
+            else:
+                self.search.discard("tag", tag)
+
+    def _stored_tags(self, position, fields):
+        # Current tags of a row for the given fields, read from the bitsets
+        return {
+            field: self.tags.row_tags(position, field)
+            for field in TAG_FIELDS
+            if field in fields
+        }
+
+    def row_tags(self, position):
+        """
+        Return the (category, subcategory, focus category, focus subcategory) lists of a row.
+        Tags are decoded from the bitsets, then put in the order the row stores them, so
+        saving the lists back leaves the stored strings unchanged.
+        """
+        row_tags = []
+        for field in TAG_FIELDS:
+            decoded = self.tags.row_tags(position, field)
+            if len(decoded) > 1:
+                stored = split_tags(self.frame[field].array[position])
+                order = {tag: i for i, tag in reversed(list(enumerate(stored)))}
+                decoded.sort(key=lambda tag: order.get(tag, len(order)))
+            row_tags.append(decoded)
+        return tuple(row_tags)
+
+    def select(self, field, all_of=(), any_of=(), none_of=()):
+        """
+        Return the problems whose tags in field match the query, e.g.
+        select("Subcategory", all_of=["Rate law"], none_of=["Thermodynamics"]).
+        """
+        return self.frame[self.tags.mask(field, all_of, any_of, none_of) & self.live]
+
+    def rows(self, problem_ids):
+        """
+        Return the problems with the given IDs, in table order.
+        """
+        positions = sorted(
+            position
+            for problem_id in problem_ids
+            if problem_id in self.index
+            for position in self.positions(problem_id)
+        )
+        return self.frame.iloc[positions]
@@ -0,0 +1,397 @@
+import numpy as np
+import pandas as pd
+
+# Multi-valued columns stored on disk as ", "-joined strings
+TAG_FIELDS = ["Category", "Subcategory", "Focus_Category", "Focus_Subcategory"]
+TAG_SEPARATOR = ", "
+
+WORD_BITS = 64
+
+
+def split_tags(value):
+    """
+    Split a stored ", "-joined tag string into a list, treating NaN/None/"" as no tags.
+    """
+    if isinstance(value, str):
+        return [tag for tag in value.split(TAG_SEPARATOR) if tag]
+    if isinstance(value, (list, tuple, set)):
+        return [tag for tag in value if tag]
+    return []
+
+
+def join_tags(tags):
+    """
+    Join a list of tags into the on-disk string form.
+    """
+    return TAG_SEPARATOR.join(tag for tag in tags if tag)
+
+
+def explode_tags(values):
+    """
+    Split a Series of joined tag strings into one entry per tag, indexed by the label
+    of the row it came from (rows keep their tag order; empty rows drop out).
+    Each distinct string is split once, so a column holding few distinct tag
+    combinations (e.g. a categorical one) costs a join instead of a split per row.
+    """
+    codes, uniques = pd.factorize(values)
+    parts = pd.Series(np.asarray(uniques, dtype=object)).astype(str)
+    parts = parts.str.split(TAG_SEPARATOR).explode()
+    parts = parts[parts.notna() & (parts != "")]
+    pairs = pd.DataFrame({"row": np.arange(len(codes)), "unique": codes}).merge(
+        pd.DataFrame({"unique": parts.index.to_numpy(), "tag": parts.to_numpy()}),
+        on="unique",
+    )
+    return pd.Series(
+        pairs["tag"].to_numpy(), index=values.index[pairs["row"].to_numpy()], dtype=object
+    )
+
+
+def rewrite_tags(values, mapping):
+    """
+    Apply mapping (tag -> new tag, or None to drop the tag) to a Series of joined tag
+    strings in one vectorized pass. Other tags are kept in place, and a tag that a merge
+    makes appear twice in a row is kept once.
+    """
+    exploded = explode_tags(values)
+    hit = exploded.isin(list(mapping))
+    exploded = exploded.where(~hit, exploded.map(mapping))
+    exploded = exploded[exploded.notna() & (exploded != "")]
+    pairs = pd.DataFrame({"row": exploded.index, "tag": exploded.to_numpy()})
+    pairs = pairs.drop_duplicates()
+    if len(pairs) == 0:
+        return pd.Series("", index=values.index)
+
+    # Join back without a per-row Python call: put each row's n-th tag in column n
+    # (with its separator in front) and concatenate the columns
+    pairs["slot"] = pairs.groupby("row", sort=False).cumcount()
+    pairs["tag"] = pairs["tag"].where(pairs["slot"] == 0, TAG_SEPARATOR + pairs["tag"])
+    wide = pairs.pivot(index="row", columns="slot", values="tag").fillna("")
+    joined = wide[0].str.cat([wide[slot] for slot in wide.columns[1:]])
+    return joined.reindex(values.index, fill_value="")
+
+
+def add_tags(values, tags):
+    """
+    Append tags to each joined tag string in a Series, skipping tags a row already
+    has. Like explode_tags(), each distinct string is rewritten once.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    added = [
+        join_tags(current + [tag for tag in tags if tag not in current])
+        for current in map(split_tags, uniques)
+    ]
+    return pd.Series(np.asarray(added, dtype=object)[codes], index=values.index)
+
+
+class TagMatrix:
+    """
+    Problem x tag bitset for each tag field.
+
+    Every distinct tag gets an integer code and each row stores its tags as bits in a
+    few uint64 words, so "tagged X AND Y but not Z" is a handful of vectorized
+    AND/OR operations over the whole table. Row i is the problem at df position i.
+    """
+
+    def __init__(self, vocabulary=()):
+        self.tags = []
+        self.codes = {}
+        self.n_rows = 0
+        self.words = {field: np.zeros((0, 1), dtype=np.uint64) for field in TAG_FIELDS}
+        for tag in vocabulary:
+            self.code(tag)
+
+    @classmethod
+    def from_frame(cls, df, vocabulary=()):
+        """
+        Build the matrix for a DataFrame in one vectorized pass per field.
+        """
+        matrix = cls(vocabulary)
+        matrix.append_frame(df)
+        return matrix
+
+    def append_frame(self, df):
+        """
+        Append the rows of a DataFrame, encoding each field in one vectorized pass.
+        """
+        offset = self.n_rows
+        self._reserve(offset + len(df))
+        self.n_rows += len(df)
+        self._set_bits(np.arange(offset, offset + len(df)), df)
+
+    def set_rows(self, positions, df):
+        """
+        Overwrite the tag bits of the rows at positions with those of the matching rows
+        of df (row i goes to positions[i]). Fields missing from df are left unchanged.
+        """
+        for field in TAG_FIELDS:
+            if field in df.columns:
+                self.words[field][positions] = 0
+        self._set_bits(np.asarray(positions, dtype=np.int64), df)
+
+    def _set_bits(self, positions, df):
+        # OR the tags of row i of df into the words of row positions[i], per field
+        for field in TAG_FIELDS:
+            if field not in df.columns or len(df) == 0:
+                continue
+            exploded = explode_tags(df[field].reset_index(drop=True))
+            for tag in exploded.unique():
+                self.code(tag)
+            self._ensure_width()
+            codes = exploded.map(self.codes).to_numpy(dtype=np.int64)
+            rows = positions[exploded.index.to_numpy(dtype=np.int64)]
+            np.bitwise_or.at(
+                self.words[field],
+                (rows, codes // WORD_BITS),
+                np.left_shift(np.uint64(1), (codes % WORD_BITS).astype(np.uint64)),
+            )
+
+    def code(self, tag):
+        """
+        Return the integer code for a tag, assigning the next free code if it is new.
+        """
+        code = self.codes.get(tag)
+        if code is None:
+            code = len(self.tags)
+            self.codes[tag] = code
+            self.tags.append(tag)
+        return code
+
+    def _ensure_width(self):
+        # Widen every field by whole words once the vocabulary outgrows them
+        n_words = max(1, -(-len(self.tags) // WORD_BITS))
+        for field, words in self.words.items():
+            if words.shape[1] < n_words:
+                extra = np.zeros((words.shape[0], n_words - words.shape[1]), np.uint64)
+                self.words[field] = np.hstack([words, extra])
+
+    def _reserve(self, n_rows):
+        # Grow row capacity geometrically so appends are amortized O(1)
+        for field, words in self.words.items():
+            if words.shape[0] < n_rows:
+                capacity = max(n_rows, 2 * words.shape[0], 16)
+                grown = np.zeros((capacity, words.shape[1]), dtype=np.uint64)
+                grown[: words.shape[0]] = words
+                self.words[field] = grown
+
+    def _query_words(self, tags):
+        # Bit pattern with one bit set per (known) tag
+        query = np.zeros(self.words[TAG_FIELDS[0]].shape[1], dtype=np.uint64)
+        for tag in tags:
+            code = self.codes[tag]
+            query[code // WORD_BITS] |= np.uint64(1) << np.uint64(code % WORD_BITS)
+        return query
+
+    def set_row(self, position, row):
+        """
+        Overwrite the tag bits of one row from a dict of field -> tags (list or joined string).
+        Fields missing from the dict are left unchanged.
+        """
+        fields = [field for field in TAG_FIELDS if field in row]
+        for field in fields:
+            for tag in split_tags(row[field]):
+                self.code(tag)
+        self._ensure_width()
+        for field in fields:
+            self.words[field][position] = self._query_words(split_tags(row[field]))
+
+    def append_row(self, row):
+        """
+        Add a row at the end and return its position.
+        """
+        position = self.n_rows
+        self._reserve(position + 1)
+        self.n_rows += 1
+        self.set_row(position, row)
+        return position
+
+    def rewrite(self, field, positions, mapping):
+        """
+        Apply mapping (tag -> new tag, or None) to the given rows of a field with
+        whole-array bit operations: each old tag's bit is cleared, and the new tag's
+        bit is set on the rows that had it.
+        """
+        for new in mapping.values():
+            if new:
+                self.code(new)
+        self._ensure_width()
+        rows = self.words[field][positions]
+        for old, new in mapping.items():
+            if old not in self.codes:
+                continue
+            query = self._query_words([old])
+            had = np.any((rows & query) != 0, axis=1)
+            rows &= ~query
+            if new:
+                rows[had] |= self._query_words([new])
+        self.words[field][positions] = rows
+
+    def delete_rows(self, positions):
+        """
+        Remove rows, shifting later rows up to stay aligned with the DataFrame.
+        """
+        for field, words in self.words.items():
+            self.words[field] = np.delete(words[: self.n_rows], positions, axis=0)
+        self.n_rows -= len(positions)
+
+    def row_tags(self, position, field):
+        """
+        Decode one row's tags for a field, in code (taxonomy) order.
+        """
+        row = self.words[field][position].astype("<u8")
+        codes = np.flatnonzero(np.unpackbits(row.view(np.uint8), bitorder="little"))
+        return [self.tags[code] for code in codes]
+
+    def mask(self, field, all_of=(), any_of=(), none_of=()):
+        """
+        Boolean array over rows: has every tag in all_of, at least one in any_of
+        (if given) and none of none_of.
+        """
+        words = self.words[field][: self.n_rows]
+        result = np.ones(self.n_rows, dtype=bool)
+
+        if any(tag not in self.codes for tag in all_of):
+            return np.zeros(self.n_rows, dtype=bool)
+        if all_of:
+            query = self._query_words(all_of)
+            result &= np.all((words & query) == query, axis=1)
+
+        known_any = [tag for tag in any_of if tag in self.codes]
+        if any_of:
+            query = self._query_words(known_any)
+            result &= np.any((words & query) != 0, axis=1)
+
+        known_none = [tag for tag in none_of if tag in self.codes]
+        if known_none:
+            query = self._query_words(known_none)
+            result &= ~np.any((words & query) != 0, axis=1)
+
+        return result
+
+
+class TagPostings:
+    """
+    Inverted index from tag to the set of problem IDs carrying it, per tag field.
+
+    Lookups and intersections cost time proportional to the posting lists involved,
+    not to the number of problems, and single-row changes touch only that row's tags.
+    """
+
+    def __init__(self):
+        self.postings = {field: {} for field in TAG_FIELDS}
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Build the index for a DataFrame with one explode/groupby per field.
+        """
+        index = cls()
+        for field in TAG_FIELDS:
+            if field not in df.columns or len(df) == 0:
+                continue
+            exploded = explode_tags(df.set_index("Custom_Problem_ID")[field])
+            # Plain object array: sets are built far faster from it than from an
+            # Arrow-backed string column
+            ids = exploded.index.to_numpy(dtype=object)
+            index.postings[field] = {
+                tag: set(ids[positions])
+                for tag, positions in exploded.groupby(exploded.to_numpy()).indices.items()
+            }
+        return index
+
+    def merge(self, other):
+        """
+        Add every posting of another index (e.g. one built for a batch of new rows).
+        """
+        for field in TAG_FIELDS:
+            for tag, ids in other.postings[field].items():
+                self.postings[field].setdefault(tag, set()).update(ids)
+
+    def discard(self, other):
+        """
+        Remove every posting of another index (e.g. one built for rows about to change),
+        dropping emptied lists.
+        """
+        for field in TAG_FIELDS:
+            postings = self.postings[field]
+            for tag, ids in other.postings[field].items():
+                if tag in postings:
+                    postings[tag] -= ids
+                    if not postings[tag]:
+                        del postings[tag]
+
+    def add(self, problem_id, row):
+        """
+        Index a problem's tags (fields missing from the row dict are ignored).
+        """
+        for field in TAG_FIELDS:
+            if field in row:
+                for tag in split_tags(row[field]):
+                    self.postings[field].setdefault(tag, set()).add(problem_id)
+
+    def remove(self, problem_id, row):
+        """
+        Drop a problem from the posting lists of the given tags, removing emptied lists.
+        """
+        for field in TAG_FIELDS:
+            if field in row:
+                for tag in split_tags(row[field]):
+                    ids = self.postings[field].get(tag)
+                    if ids is None:
+                        continue
+                    ids.discard(problem_id)
+                    if not ids:
+                        del self.postings[field][tag]
+
+    def rewrite(self, field, problem_ids, mapping):
+        """
+        Move the given problems from each old tag's posting list to its new tag's
+        (mapping: tag -> new tag, or None to just drop them).
+        """
+        postings = self.postings[field]
+        moved = {}
+        for old, new in mapping.items():
+            ids = postings.get(old)
+            if ids is None:
+                continue
+            gained = ids & problem_ids
+            ids -= gained
+            if not ids:
+                del postings[old]
+            if new:
+                moved.setdefault(new, set()).update(gained)
+        for new, ids in moved.items():
+            postings.setdefault(new, set()).update(ids)
+
+    def lookup(self, field, tag):
+        """
+        Return the IDs of problems whose field includes tag (do not mutate the result).
+        """
+        return self.postings[field].get(tag, set())
+
+    def tags(self, field):
+        """
+        Return the tags that currently have at least one problem in field.
+        """
+        return list(self.postings[field])
+
+    def query(self, field, all_of=(), any_of=(), none_of=()):
+        """
+        Return the set of IDs that have every tag in all_of, at least one in any_of and
+        none of none_of. all_of and any_of cannot both be empty.
+        """
+        if not all_of and not any_of:
+            raise ValueError("query needs at least one of all_of or any_of")
+
+        result = None
+        if all_of:
+            # Intersect starting from the shortest list so the work tracks the result
+            lists = sorted((self.lookup(field, tag) for tag in all_of), key=len)
+            result = set(lists[0])
+            for ids in lists[1:]:
+                result &= ids
+        if any_of:
+            matches = set().union(*(self.lookup(field, tag) for tag in any_of))
+            result = matches if result is None else result & matches
+        for tag in none_of:
+            result -= self.lookup(field, tag)
+        return result
@@ -0,0 +1,46 @@
+class Taxonomy:
+    """
+    Read-only lookup structure over one version of the categories file.
+
+    Holds each category's subcategories in file order, the reverse map from a
+    subcategory to the categories listing it (names may repeat across categories),
+    and the dropdown options for any set of selected categories, memoized per set.
+    Options always come in file order with a leading blank, whatever order the
+    categories were selected in, so widgets keep a stable order across reruns.
+    """
+
+    def __init__(self, categories, subcategories):
+        self.categories = tuple(categories)
+        self.subcategories = {
+            category: tuple(dict.fromkeys(subcategories.get(category, ())))
+            for category in self.categories
+        }
+        categories_of = {}
+        for category, subs in self.subcategories.items():
+            for sub in subs:
+                categories_of.setdefault(sub, []).append(category)
+        self.categories_of = {sub: tuple(cats) for sub, cats in categories_of.items()}
+        # Ensure a blank option is available for categories and subcategories
+        self.category_options = ["", *self.categories]
+        self._options = {}
+
+    def options(self, selected, include=()):
+        """
+        Subcategory options for the selected categories: a blank, then the
+        subcategories of the selected categories in file order, then any of include
+        (e.g. a problem's current tags) that aren't among them.
+        """
+        key = frozenset(selected)
+        options = self._options.get(key)
+        if options is None:
+            options = [""] + list(
+                dict.fromkeys(
+                    sub
+                    for category in self.categories
+                    if category in key
+                    for sub in self.subcategories[category]
+                )
+            )
+            self._options[key] = options
+        missing = [sub for sub in dict.fromkeys(include) if sub not in options]
+        return options + missing if missing else options
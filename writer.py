@@ -0,0 +1,97 @@
+import atexit
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait after the first pending write so a burst of edits shares one write
+WRITE_INTERVAL = 0.5
+
+
+class BackgroundWriter:
+    """
+    Debounced, coalescing writer thread shared by every session in the process.
+
+    submit() queues a write under a key (e.g. one per file); a later submit for the same
+    key replaces the queued one, so N rapid edits become a single write of the latest
+    state. The thread runs whatever is queued WRITE_INTERVAL seconds after the first
+    submit. flush() runs everything still queued in the calling thread.
+    """
+
+    def __init__(self, interval=WRITE_INTERVAL):
+        self.interval = interval
+        self._pending = {}
+        self._condition = threading.Condition()
+        # Held while a batch runs, so batches (thread or flush) never interleave or reorder
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self.submitted = 0
+        self.writes = 0
+        self.failures = 0
+
+    def submit(self, key, write):
+        """
+        Queue write() under key, replacing any write still queued for that key.
+        """
+        with self._condition:
+            self._pending[key] = write
+            self.submitted += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="problem-db-writer", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+            # Debounce: let the burst finish before writing
+            time.sleep(self.interval)
+            self._write_pending()
+
+    def _write_pending(self, keys=None):
+        with self._write_lock:
+            with self._condition:
+                if keys is None:
+                    batch = list(self._pending.values())
+                    self._pending.clear()
+                else:
+                    batch = [self._pending.pop(k) for k in keys if k in self._pending]
+            for write in batch:
+                try:
+                    write()
+                    self.writes += 1
+                except Exception:
+                    self.failures += 1
+                    logger.exception("Background write failed")
+
+    def flush(self, keys=None, wait=True):
+        """
+        Run every queued write (or only those queued under keys) now and return once
+        they are on disk. With wait=False they run on a thread of their own instead, for
+        callers that may hold a lock one of the writes needs.
+        """
+        if wait:
+            self._write_pending(keys)
+        else:
+            threading.Thread(
+                target=self._write_pending, args=(keys,), name="problem-db-flush"
+            ).start()
+
+    def stats(self):
+        """
+        Return how many writes were submitted, actually performed and failed.
+        """
+        return {
+            "submitted": self.submitted,
+            "writes": self.writes,
+            "failures": self.failures,
+        }
+
+
+WRITER = BackgroundWriter()
+atexit.register(WRITER.flush)